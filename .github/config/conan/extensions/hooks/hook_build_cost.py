@@ -0,0 +1,158 @@
+"""Record the cost of the source, build and package steps of every package.
+
+One JSON record per step is appended to ``user.build_cost:file``, by default
+``build-cost.jsonl`` in the conan home. ``scripts/build_cost.py`` aggregates
+them.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_started = {}
+
+
+def _get_children_usage():
+    """CPU seconds and peak RSS in bytes of all finished child processes."""
+    if resource is None:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return usage.ru_utime + usage.ru_stime, peak_rss
+
+
+def _get_ccache_stats():
+    if shutil.which("ccache") is None:
+        return None
+    try:
+        proc = subprocess.run(
+            ["ccache", "--print-stats"], capture_output=True, text=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0:
+        return None
+    stats = {}
+    for line in proc.stdout.splitlines():
+        key, _, value = line.partition("\t")
+        if value.isdigit():
+            stats[key] = int(value)
+    return stats
+
+
+def _get_folder_size(folder):
+    size = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if not os.path.islink(path):
+                size += os.path.getsize(path)
+    return size
+
+
+def _get_package_id(conanfile):
+    try:
+        return conanfile.info.package_id()
+    except Exception:
+        return None
+
+
+def _get_history_path(conanfile):
+    conan_home = os.environ.get("CONAN_HOME") or os.path.join(
+        os.path.expanduser("~"), ".conan2"
+    )
+    return conanfile.conf.get(
+        "user.build_cost:file",
+        default=os.path.join(conan_home, "build-cost.jsonl"),
+        check_type=str,
+    )
+
+
+def _start(conanfile, step, ccache=False):
+    cpu_time, _ = _get_children_usage()
+    _started[(id(conanfile), step)] = (
+        time.time(),
+        time.monotonic(),
+        cpu_time,
+        _get_ccache_stats() if ccache else None,
+    )
+
+
+def _finish(conanfile, step, success=True):
+    started = _started.pop((id(conanfile), step), None)
+    if started is None:
+        return
+    start_time, start_monotonic, start_cpu_time, start_ccache = started
+    cpu_time, peak_rss = _get_children_usage()
+
+    record = {
+        "time": start_time,
+        "reference": str(conanfile.ref),
+        "revision": conanfile.ref.revision,
+        "package_id": None if step == "source" else _get_package_id(conanfile),
+        "profile": conanfile.conf.get(
+            "user.build_cost:profile", default="", check_type=str
+        ),
+        "context": getattr(conanfile, "context", None),
+        "step": step,
+        "success": success,
+        "wall_time": round(time.monotonic() - start_monotonic, 3),
+        "cpu_time": None if cpu_time is None else round(cpu_time - start_cpu_time, 3),
+        # The peak of the largest child process so far, it cannot be reset per step
+        "peak_rss": peak_rss,
+    }
+    if start_ccache is not None:
+        ccache = _get_ccache_stats() or {}
+        record["ccache"] = {
+            key: value - start_ccache.get(key, 0)
+            for key, value in ccache.items()
+            if value != start_ccache.get(key, 0) and not key.endswith("_timestamp")
+        }
+    if step == "package":
+        record["package_size"] = _get_folder_size(conanfile.package_folder)
+
+    history_path = _get_history_path(conanfile)
+    try:
+        os.makedirs(os.path.dirname(history_path), exist_ok=True)
+        # A single short write, so concurrent conan processes do not interleave records
+        with open(history_path, "a") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+    except OSError as e:
+        conanfile.output.warning(f"Could not record build cost in {history_path}: {e}")
+
+
+def pre_source(conanfile):
+    _start(conanfile, "source")
+
+
+def post_source(conanfile):
+    _finish(conanfile, "source")
+
+
+def pre_build(conanfile):
+    _start(conanfile, "build", ccache=True)
+
+
+def post_build(conanfile):
+    _finish(conanfile, "build")
+
+
+def post_build_fail(conanfile):
+    _finish(conanfile, "build", success=False)
+
+
+def pre_package(conanfile):
+    _start(conanfile, "package")
+
+
+def post_package(conanfile):
+    _finish(conanfile, "package")
@@ -0,0 +1,36 @@
+"""Keep ``__FILE__`` and debug info free of the build folder of a package.
+
+Conan build folders contain a hash that changes with every recipe revision.
+The profiles include ``profiles/include/ccache``, which sets ``CCACHE_BASEDIR``
+and ``CCACHE_NOHASHDIR`` so ccache hashes paths relative to the conan home.
+With ``user.ccache:file_prefix_map``, set by all profiles but the MSVC one,
+this hook also maps the source and build folders to fixed names with
+``-ffile-prefix-map``, which ccache leaves out of its hash.
+"""
+
+
+def _get_prefix_map_flags(conanfile):
+    folders = {}
+    for folder, name in [
+        (conanfile.source_folder, "source"),
+        (conanfile.build_folder, "build"),
+    ]:
+        if folder and folder not in folders:
+            folders[folder] = name
+    # GCC and Clang use the last matching map, nested folders have to come after their parents
+    return [
+        f"-ffile-prefix-map={folder}={folders[folder]}"
+        for folder in sorted(folders, key=len)
+    ]
+
+
+def pre_generate(conanfile):
+    if not conanfile.conf.get(
+        "user.ccache:file_prefix_map", default=False, check_type=bool
+    ):
+        return
+    if conanfile.settings.get_safe("compiler") == "msvc":
+        return
+    flags = _get_prefix_map_flags(conanfile)
+    for name in ["tools.build:cflags", "tools.build:cxxflags"]:
+        conanfile.conf.append(name, flags)
@@ -2,8 +2,8 @@ from conan import ConanFile
 from conan.tools.apple import is_apple_os
 from conan.tools.env import VirtualBuildEnv
 from conan.tools.files import (
-    apply_conandata_patches, chdir, copy, export_conandata_patches, get, mkdir,
-    rename, replace_in_file, rm, rmdir
+    chdir, copy, export_conandata_patches, mkdir, rename, replace_in_file, rm,
+    rmdir
 )
 from conan.tools.gnu import Autotools, AutotoolsToolchain
 from conan.tools.layout import basic_layout
@@ -21,6 +21,8 @@ class Argon2Conan(ConanFile):
     description = "Argon2 password hashing library"
     topics = ("crypto", "password hashing")
 
+    python_requires = "source-snapshot/1.0.0"
+
     package_type = "library"
     settings = "os", "arch", "compiler", "build_type"
     options = {
@@ -63,7 +65,7 @@ class Argon2Conan(ConanFile):
                 self.tool_requires("msys2/cci.latest")
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version], strip_root=True)
+        self.python_requires["source-snapshot"].module.snapshot_source(self)
 
     @property
     def _kernel_name(self):
@@ -91,7 +93,6 @@ class Argon2Conan(ConanFile):
             tc.generate()
 
     def build(self):
-        apply_conandata_patches(self)
         if is_msvc(self):
             vcxproj = os.path.join(self.source_folder, "vs2015", "Argon2OptDll", "Argon2OptDll.vcxproj")
             argon2_header = os.path.join(self.source_folder, "include", "argon2.h")
@@ -23,6 +23,7 @@ class CairoConan(ConanFile):
     url = "https://github.com/conan-io/conan-center-index"
     homepage = "https://cairographics.org/"
     license = ("LGPL-2.1-only", "MPL-1.1")
+    python_requires = "unity-build/1.0.0"
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
@@ -39,6 +40,7 @@ class CairoConan(ConanFile):
         "with_opengl": [False, "desktop", "gles2", "gles3"],
         "with_symbol_lookup": [True, False],
         "tee": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
@@ -63,6 +65,7 @@ class CairoConan(ConanFile):
         "with_opengl": "desktop",
         "with_symbol_lookup": False,
         "tee": False,
+        "unity_build": False,
     }
     short_paths = True
 
@@ -121,6 +124,9 @@ class CairoConan(ConanFile):
         if self.options.get_safe("with_opengl") and self.settings.os in ["Linux", "FreeBSD"]:
             self.requires("egl/system", transitive_headers=True, transitive_libs=True)
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def validate(self):
         if self.options.get_safe("with_xlib_xrender") and not self.options.get_safe("with_xlib"):
             raise ConanInvalidConfiguration("'with_xlib_xrender' option requires 'with_xlib' option to be enabled as well!")
@@ -208,6 +214,7 @@ class CairoConan(ConanFile):
         if not self.options.shared:
             meson.c_args.append("-DCAIRO_WIN32_STATIC_BUILD")
 
+        self.python_requires["unity-build"].module.configure_meson(self, meson)
         meson.generate()
 
     def build(self):
@@ -18,14 +18,17 @@ class FontconfigConan(ConanFile):
     description = "Fontconfig is a library for configuring and customizing font access"
     homepage = "https://gitlab.freedesktop.org/fontconfig/fontconfig"
     topics = ("fonts", "freedesktop")
+    python_requires = "unity-build/1.0.0"
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
         "fPIC": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
         "fPIC": True,
+        "unity_build": False,
     }
 
     def config_options(self):
@@ -38,6 +41,9 @@ class FontconfigConan(ConanFile):
         self.settings.rm_safe("compiler.libcxx")
         self.settings.rm_safe("compiler.cppstd")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def layout(self):
         basic_layout(self, src_folder="src")
 
@@ -72,6 +78,7 @@ class FontconfigConan(ConanFile):
             "sysconfdir": os.path.join("res", "etc"),
             "datadir": os.path.join("res", "share"),
         })
+        self.python_requires["unity-build"].module.configure_meson(self, tc)
         tc.generate()
 
     def build(self):
@@ -2,7 +2,7 @@ import os
 
 from conan import ConanFile
 from conan.tools.cmake import CMakeToolchain, CMake, cmake_layout, CMakeDeps
-from conan.tools.files import get, apply_conandata_patches, copy, export_conandata_patches, rmdir
+from conan.tools.files import copy, export_conandata_patches, rmdir
 
 required_conan_version = ">=2.0.6"
 
@@ -13,6 +13,7 @@ required_conan_version = ">=2.0.6"
 class FontForgeConan(ConanFile):
     name = "fontforge"
     package_type = "library"
+    python_requires = "source-snapshot/1.0.0", "unity-build/1.0.0"
 
     license = ("GPLv3-or-later", "revised-BSD")
     homepage = "https://fontforge.org"
@@ -27,6 +28,7 @@ class FontForgeConan(ConanFile):
         "fPIC": [True, False],
         "install_private_headers": [True, False],
         "with_tiff": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
@@ -35,6 +37,7 @@ class FontForgeConan(ConanFile):
         # @TODO: re-enable libtiff by default
         "with_tiff": False,
         # "with_tiff": True,
+        "unity_build": False,
     }
 
     def requirements(self):
@@ -70,12 +73,14 @@ class FontForgeConan(ConanFile):
         if self.options.shared:
             self.options.rm_safe("fPIC")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def export_sources(self):
         export_conandata_patches(self)
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version], strip_root=True)
-        apply_conandata_patches(self)
+        self.python_requires["source-snapshot"].module.snapshot_source(self)
 
     def layout(self):
         cmake_layout(self, src_folder="src")
@@ -93,6 +98,7 @@ class FontForgeConan(ConanFile):
         tc.variables["ENABLE_LIBREADLINE"] = "OFF"
         tc.variables["INSTALL_PRIVATE_HEADERS"] = self.options.install_private_headers
         tc.variables["CMAKE_INSTALL_INCLUDEDIR"] = "include/fontforge"
+        self.python_requires["unity-build"].module.configure_cmake(self, tc)
         tc.generate()
 
     def build(self):
@@ -25,6 +25,7 @@ class GLibConan(ConanFile):
     homepage = "https://gitlab.gnome.org/GNOME/glib"
     license = "LGPL-2.1-or-later"
     package_type = "library"
+    python_requires = "unity-build/1.0.0"
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
@@ -32,6 +33,7 @@ class GLibConan(ConanFile):
         "with_elf": [True, False],
         "with_selinux": [True, False],
         "with_mount": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
@@ -42,6 +44,7 @@ class GLibConan(ConanFile):
         # function not exported, but it's a problem with static libraries
         "with_mount": False,
         "with_selinux": True,
+        "unity_build": False,
     }
     short_paths = True
 
@@ -66,6 +69,9 @@ class GLibConan(ConanFile):
         self.settings.rm_safe("compiler.cppstd")
         self.settings.rm_safe("compiler.libcxx")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def layout(self):
         basic_layout(self, src_folder="src")
 
@@ -113,6 +119,7 @@ class GLibConan(ConanFile):
             tc.c_link_args.append("-lm")
             tc.c_link_args.append("-lsocket")
 
+        self.python_requires["unity-build"].module.configure_meson(self, tc)
         tc.generate()
 
     def _patch_sources(self):
@@ -2,9 +2,7 @@ from conan import ConanFile
 from conan.tools.build import check_min_cppstd
 from conan.tools.cmake import CMakeToolchain, CMakeDeps, CMake, cmake_layout
 from conan.tools.env import Environment
-from conan.tools.files import (
-    apply_conandata_patches, export_conandata_patches, get
-)
+from conan.tools.files import export_conandata_patches
 from conan.tools.scm import Version
 
 
@@ -17,6 +15,8 @@ class OpenDocumentCoreConan(ConanFile):
     topics = "open document", "openoffice xml", "open document reader"
     license = "MPL-2.0"
 
+    python_requires = "source-snapshot/1.0.0"
+
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
@@ -117,8 +117,7 @@ class OpenDocumentCoreConan(ConanFile):
         export_conandata_patches(self)
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version]["source"], strip_root=True)
-        apply_conandata_patches(self)
+        self.python_requires["source-snapshot"].module.snapshot_source(self)
 
     def layout(self):
         cmake_layout(self, src_folder="src")
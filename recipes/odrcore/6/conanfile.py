@@ -2,9 +2,7 @@ from conan import ConanFile
 from conan.tools.build import check_min_cppstd
 from conan.tools.cmake import CMakeToolchain, CMakeDeps, CMake, cmake_layout
 from conan.tools.env import Environment
-from conan.tools.files import (
-    apply_conandata_patches, export_conandata_patches, get
-)
+from conan.tools.files import export_conandata_patches
 
 
 class OpenDocumentCoreConan(ConanFile):
@@ -16,6 +14,8 @@ class OpenDocumentCoreConan(ConanFile):
     topics = "open document", "openoffice xml", "open document reader"
     license = "MPL-2.0"
 
+    python_requires = "source-snapshot/1.0.0", "unity-build/1.0.0"
+
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
@@ -26,6 +26,7 @@ class OpenDocumentCoreConan(ConanFile):
         "with_python": [True, False],
         "with_jni": [True, False],
         "bundle_assets": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
@@ -36,6 +37,7 @@ class OpenDocumentCoreConan(ConanFile):
         "with_python": False,
         "with_jni": False,
         "bundle_assets": True,
+        "unity_build": False,
     }
 
     def config_options(self):
@@ -47,6 +49,9 @@ class OpenDocumentCoreConan(ConanFile):
         if self.options.shared:
             self.options.rm_safe("fPIC")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def requirements(self):
         self.requires("pugixml/1.15")
         self.requires("cryptopp/8.9.0")
@@ -75,8 +80,7 @@ class OpenDocumentCoreConan(ConanFile):
         export_conandata_patches(self)
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version]["source"], strip_root=True)
-        apply_conandata_patches(self)
+        self.python_requires["source-snapshot"].module.snapshot_source(self)
 
     def layout(self):
         cmake_layout(self, src_folder="src")
@@ -107,6 +111,7 @@ class OpenDocumentCoreConan(ConanFile):
         envvars = runenv_info.vars(self)
         tc.variables["LIBMAGIC_DATABASE_PATH"] = envvars.get("MAGIC")
 
+        self.python_requires["unity-build"].module.configure_cmake(self, tc)
         tc.generate()
 
         deps = CMakeDeps(self)
@@ -18,10 +18,12 @@ class OpenLibmConan(ConanFile):
     description = "OpenLibm is an effort to have a high quality, portable, standalone C mathematical library (libm)"
     topics = ("math", "complex math")
 
+    python_requires = "unity-build/1.0.0"
+
     # Binary configuration
     settings = "os", "compiler", "build_type", "arch"
-    options = {"shared": [True, False], "fPIC": [True, False]}
-    default_options = {"shared": False, "fPIC": True}
+    options = {"shared": [True, False], "fPIC": [True, False], "unity_build": [True, False]}
+    default_options = {"shared": False, "fPIC": True, "unity_build": False}
 
     def export_sources(self):
         export_conandata_patches(self)
@@ -38,6 +40,9 @@ class OpenLibmConan(ConanFile):
         if self.options.shared:
             self.options.rm_safe("fPIC")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def validate(self):
         if self.settings.os == "Windows":
             raise ConanInvalidConfiguration("OpenLibm does not support Windows")
@@ -49,6 +54,9 @@ class OpenLibmConan(ConanFile):
         deps = CMakeDeps(self)
         deps.generate()
         tc = CMakeToolchain(self)
+        # The msun sources all define file scope constants like one, huge and tiny,
+        # so they cannot be compiled together
+        self.python_requires["unity-build"].module.configure_cmake(self, tc, {"openlibm": "*"})
         tc.generate()
 
     def build(self):
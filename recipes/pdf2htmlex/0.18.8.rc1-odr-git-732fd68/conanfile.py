@@ -4,7 +4,7 @@ import stat
 from conan import ConanFile
 from conan.tools.cmake import CMakeToolchain, CMake, cmake_layout, CMakeDeps
 from conan.tools.env import Environment
-from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, get, rmdir
+from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, rmdir
 from conan.errors import ConanInvalidConfiguration
 
 required_conan_version = ">=2.0.6"
@@ -13,6 +13,7 @@ required_conan_version = ">=2.0.6"
 class pdf2htmlEXConan(ConanFile):
     name = "pdf2htmlex"
     package_type = "library"
+    python_requires = "source-snapshot/1.0.0", "unity-build/1.0.0"
 
     license = ["GPLv3-or-later", "MIT", "CC-BY-3.0"]
     homepage = "https://github.com/pdf2htmlEX/pdf2htmlEX"
@@ -22,8 +23,8 @@ class pdf2htmlEXConan(ConanFile):
 
     # Binary configuration
     settings = "os", "compiler", "build_type", "arch"
-    options = {"shared": [True, False], "fPIC": [True, False]}
-    default_options = {"shared": False, "fPIC": True}
+    options = {"shared": [True, False], "fPIC": [True, False], "unity_build": [True, False]}
+    default_options = {"shared": False, "fPIC": True, "unity_build": False}
 
     def config_options(self):
         if self.settings.os == "Windows":
@@ -33,6 +34,9 @@ class pdf2htmlEXConan(ConanFile):
         if self.options.shared:
             self.options.rm_safe("fPIC")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def validate(self):
         if not self.dependencies["poppler"].options.with_cairo:
             raise ConanInvalidConfiguration('Dependency "poppler" needs to be built with "with_cairo" option')
@@ -79,7 +83,9 @@ class pdf2htmlEXConan(ConanFile):
         export_conandata_patches(self)
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version], strip_root=True)
+        self.python_requires["source-snapshot"].module.snapshot_source(self, self._patch_sources)
+
+    def _patch_sources(self):
         apply_conandata_patches(self)
 
         # @TODO: use build_tools for closure compiler and yuicompressor
@@ -106,6 +112,7 @@ class pdf2htmlEXConan(ConanFile):
         for v in ["POPPLER_DATA_DIR", "FONTCONFIG_PATH"]:
             tc.variables[v] = envvars.get(v)
         # @TODO: figure out how to use POPPLER_DATA_DIR exported by poppler-data. It should JustWork^tm
+        self.python_requires["unity-build"].module.configure_cmake(self, tc)
         tc.generate()
 
     def build(self):
@@ -8,7 +8,7 @@ from conan.errors import ConanInvalidConfiguration
 from conan.tools.build import check_min_cppstd, cross_building, valid_min_cppstd
 from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
 from conan.tools.env import VirtualBuildEnv
-from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, get, replace_in_file, rmdir
+from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, replace_in_file, rmdir
 from conan.tools.gnu import PkgConfigDeps
 from conan.tools.scm import Version
 
@@ -24,6 +24,7 @@ class PopplerConan(ConanFile):
     topics = ("pdf", "rendering")
 
     package_type = "library"
+    python_requires = "source-snapshot/1.0.0", "unity-build/1.0.0"
     settings = "os", "arch", "compiler", "build_type"
     options = {
         "shared": [True, False],
@@ -46,6 +47,7 @@ class PopplerConan(ConanFile):
         "with_tiff": [True, False],
         "with_libcurl": [True, False],
         "with_zlib": [True, False],
+        "unity_build": [True, False],
     }
     default_options = {
         "shared": False,
@@ -70,6 +72,7 @@ class PopplerConan(ConanFile):
         "with_libcurl": False,
         "with_zlib": True,
         "float": False,
+        "unity_build": False,
     }
 
     @property
@@ -150,6 +153,9 @@ class PopplerConan(ConanFile):
         if self.options.with_zlib:
             self.requires("zlib/[>=1.2.11 <2]")
 
+    def package_id(self):
+        del self.info.options.unity_build
+
     def validate(self):
         if self.options.fontconfiguration == "win32" and self.settings.os != "Windows":
             raise ConanInvalidConfiguration("'win32' option of fontconfig is only available on Windows")
@@ -170,8 +176,7 @@ class PopplerConan(ConanFile):
         self.tool_requires("cmake/[>=3.31.10 <4]")
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version], strip_root=True)
-        self._patch_sources()
+        self.python_requires["source-snapshot"].module.snapshot_source(self, self._patch_sources)
 
     @property
     def _dct_decoder(self):
@@ -251,6 +256,7 @@ class PopplerConan(ConanFile):
         #   Unsupported CMAKE_BUILD_TYPE:
         tc.cache_variables["CMAKE_BUILD_TYPE"] = str(self.settings.build_type)
 
+        self.python_requires["unity-build"].module.configure_cmake(self, tc)
         tc.generate()
 
         deps = CMakeDeps(self)
@@ -0,0 +1,137 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import textwrap
+
+from conan import ConanFile
+from conan.tools.files import apply_conandata_patches, get
+
+required_conan_version = ">=2.0.6"
+
+# Bump to invalidate all snapshots, e.g. when the way sources are prepared changes
+SNAPSHOT_FORMAT = 1
+
+# Branch archives change with every commit, their url does not identify the sources
+MOVING_URL = re.compile(r"/refs/heads/|/archive/(main|master)\.")
+
+
+def _get_source_entry(conanfile):
+    source = conanfile.conan_data["sources"][conanfile.version]
+    # Some recipes nest the arguments of get() one level deeper
+    if "url" not in source and len(source) == 1:
+        source = next(iter(source.values()))
+    return source
+
+
+def _get_code_key(function):
+    """The code of ``function`` without comments and formatting."""
+    try:
+        code = textwrap.dedent(inspect.getsource(function))
+    except (OSError, TypeError):
+        return None
+    return ast.dump(ast.parse(code))
+
+
+def get_snapshot_key(conanfile, patch=None):
+    """Key of the patched sources of ``conanfile``.
+
+    Covers the source checksum, the ordered patches with the hashes of their
+    files and the code of ``patch``, which holds the ``replace_in_file`` edits.
+    Returns ``None`` if the sources cannot be identified, e.g. for branch
+    archives without a sha256.
+    """
+    source = _get_source_entry(conanfile)
+    urls = source["url"] if isinstance(source["url"], list) else [source["url"]]
+    origin = source.get("sha256")
+    if origin is None:
+        if MOVING_URL.search(urls[0]):
+            return None
+        origin = urls[0]
+
+    patches = []
+    for patch_entry in (conanfile.conan_data.get("patches") or {}).get(conanfile.version, []):
+        patch_entry = dict(patch_entry)
+        patch_entry.pop("patch_description", None)
+        if "patch_file" in patch_entry:
+            patch_path = os.path.join(conanfile.export_sources_folder, patch_entry["patch_file"])
+            with open(patch_path, "rb") as f:
+                patch_entry["sha256"] = hashlib.sha256(f.read()).hexdigest()
+        patches.append(patch_entry)
+
+    code = None
+    if patch is not None:
+        code = _get_code_key(patch)
+        if code is None:
+            return None
+
+    key = json.dumps([SNAPSHOT_FORMAT, conanfile.name, origin, patches, code], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_snapshot_folder(conanfile):
+    """``user.source_snapshot:folder``, by default ``source-snapshots`` in the conan home.
+    An empty value disables snapshots."""
+    default = os.path.join(os.environ.get("CONAN_HOME") or os.path.join(os.path.expanduser("~"), ".conan2"), "source-snapshots")
+    return conanfile.conf.get("user.source_snapshot:folder", default=default, check_type=str)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def snapshot_source(conanfile, patch=None):
+    """Download and patch the sources of ``conanfile``, or restore them from a snapshot.
+
+    Call from ``source()``. ``patch`` prepares the downloaded sources and
+    defaults to ``apply_conandata_patches``. Restored files are hard links into
+    the snapshot with ``user.source_snapshot:link``, which is only safe as long
+    as nothing edits the source folder in place afterwards.
+    """
+    folder = get_snapshot_folder(conanfile)
+    key = get_snapshot_key(conanfile, patch) if folder else None
+    snapshot = os.path.join(folder, key) if key else None
+
+    if snapshot is not None and os.path.isdir(snapshot):
+        conanfile.output.info(f"Restoring patched sources from snapshot {snapshot}")
+        link = conanfile.conf.get("user.source_snapshot:link", default=False, check_type=bool)
+        shutil.copytree(snapshot, conanfile.source_folder, symlinks=True, dirs_exist_ok=True,
+                        copy_function=_link_or_copy if link else shutil.copy2)
+        return
+
+    # Exported files and, for local flows, the recipe itself are not part of the snapshot
+    exported = set(os.listdir(conanfile.source_folder))
+    get(conanfile, **_get_source_entry(conanfile), strip_root=True)
+    if patch is None:
+        apply_conandata_patches(conanfile)
+    else:
+        patch()
+
+    if snapshot is None:
+        return
+    conanfile.output.info(f"Storing patched sources as snapshot {snapshot}")
+    os.makedirs(folder, exist_ok=True)
+    partial = f"{snapshot}.tmp-{os.getpid()}"
+    source_folder = conanfile.source_folder
+    shutil.copytree(source_folder, partial, symlinks=True,
+                    ignore=lambda folder, names: exported if folder == source_folder else [])
+    try:
+        os.rename(partial, snapshot)
+    except OSError:
+        # Another build stored the same snapshot first
+        shutil.rmtree(partial, ignore_errors=True)
+
+
+class SourceSnapshotConan(ConanFile):
+    name = "source-snapshot"
+    package_type = "python-require"
+
+    url = "https://github.com/opendocument-app/conan-odr-index"
+    description = "Cache of downloaded and patched recipe sources, shared between recipe revisions"
+    topics = ("sources", "cache")
@@ -0,0 +1,79 @@
+import os
+
+from conan import ConanFile
+from conan.tools.files import save
+
+required_conan_version = ">=2.0.6"
+
+# CMake's own default for CMAKE_UNITY_BUILD_BATCH_SIZE
+DEFAULT_BATCH_SIZE = 8
+
+
+def get_batch_size(conanfile):
+    """``user.unity_build:batch_size``, the number of sources compiled together."""
+    return conanfile.conf.get("user.unity_build:batch_size", default=DEFAULT_BATCH_SIZE, check_type=int)
+
+
+def configure_cmake(conanfile, tc, exclusions=None):
+    """Turn on ``CMAKE_UNITY_BUILD`` in the ``CMakeToolchain`` ``tc`` if the
+    ``unity_build`` option is set.
+
+    ``exclusions`` maps target names to sources, relative to the source folder,
+    that do not compile together with others. They are built on their own with
+    ``SKIP_UNITY_BUILD_INCLUSION``. ``"*"`` builds the whole target without
+    unity build. Targets that are not defined, e.g. because of options, are
+    ignored.
+    """
+    if not conanfile.options.get_safe("unity_build"):
+        return
+    tc.cache_variables["CMAKE_UNITY_BUILD"] = True
+    tc.cache_variables["CMAKE_UNITY_BUILD_BATCH_SIZE"] = get_batch_size(conanfile)
+    if not exclusions:
+        return
+
+    # Source properties can only be set once the targets exist, so defer them to
+    # the end of the top level CMakeLists.txt
+    lines = [
+        "include_guard(GLOBAL)",
+        "function(conan_skip_unity_build target)",
+        "    if(NOT TARGET ${target})",
+        "        return()",
+        "    endif()",
+        '    if("${ARGN}" STREQUAL "*")',
+        "        set_target_properties(${target} PROPERTIES UNITY_BUILD OFF)",
+        "    else()",
+        "        set_source_files_properties(${ARGN} TARGET_DIRECTORY ${target} PROPERTIES SKIP_UNITY_BUILD_INCLUSION ON)",
+        "    endif()",
+        "endfunction()",
+    ]
+    for target, sources in sorted(exclusions.items()):
+        if sources == "*":
+            paths = '"*"'
+        else:
+            paths = " ".join(f'"{os.path.join(conanfile.source_folder, source)}"'.replace("\\", "/") for source in sources)
+        lines.append(f'cmake_language(DEFER DIRECTORY "${{CMAKE_SOURCE_DIR}}" CALL conan_skip_unity_build {target} {paths})')
+    path = os.path.join(conanfile.generators_folder, "conan_unity_build.cmake")
+    save(conanfile, path, "\n".join(lines) + "\n")
+    tc.cache_variables["CMAKE_PROJECT_INCLUDE"] = path.replace("\\", "/")
+
+
+def configure_meson(conanfile, tc):
+    """Turn on ``unity`` in the ``MesonToolchain`` ``tc`` if the ``unity_build``
+    option is set.
+
+    Meson cannot leave single sources out of a unity build. Targets that break
+    have to opt out with ``override_options: ['unity=off']`` in a patch.
+    """
+    if not conanfile.options.get_safe("unity_build"):
+        return
+    tc.project_options["unity"] = "on"
+    tc.project_options["unity_size"] = get_batch_size(conanfile)
+
+
+class UnityBuildConan(ConanFile):
+    name = "unity-build"
+    package_type = "python-require"
+
+    url = "https://github.com/opendocument-app/conan-odr-index"
+    description = "Shared handling of the unity_build option of the CMake and Meson recipes"
+    topics = ("unity build", "jumbo build")
@@ -6,7 +6,7 @@ from conan.tools.apple import fix_apple_shared_install_name
 from conan.tools.build import cross_building
 from conan.tools.layout import basic_layout
 from conan.tools.env import Environment, VirtualBuildEnv, VirtualRunEnv
-from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, get, rm, rmdir
+from conan.tools.files import apply_conandata_patches, copy, export_conandata_patches, rm, rmdir
 from conan.tools.gnu import Autotools, AutotoolsDeps, AutotoolsToolchain, PkgConfigDeps
 from conan.tools.microsoft import is_msvc, unix_path
 
@@ -16,6 +16,7 @@ required_conan_version = ">=2.0.6"
 class wvWareConan(ConanFile):
     name = "wvware"
     package_type = "library"
+    python_requires = "source-snapshot/1.0.0"
 
     license = ["lGPLv2.1"]
     homepage = "https://sourceforge.net/projects/wvware/"
@@ -83,7 +84,9 @@ class wvWareConan(ConanFile):
         basic_layout(self, src_folder="src")
 
     def source(self):
-        get(self, **self.conan_data["sources"][self.version], strip_root=True)
+        self.python_requires["source-snapshot"].module.snapshot_source(self, self._patch_sources)
+
+    def _patch_sources(self):
         # apply patches listed in conandata.yml
         apply_conandata_patches(self)
 
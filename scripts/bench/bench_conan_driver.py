@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conan_driver import CONAN_DRIVERS, get_conan_driver
+from definitions import get_root_path, get_profiles_path
+
+
+def get_operations(root_path, profiles_path):
+    conanfile = str(root_path / "recipes/argon2/20190702/conanfile.py")
+    profile = str(profiles_path / "ubuntu-24.04-x86_64-clang-18")
+    return {
+        "export": ["conan", "export", conanfile, "--version", "20190702-odr"],
+        "graph info": [
+            "conan",
+            "graph",
+            "info",
+            conanfile,
+            "--version",
+            "20190702-odr",
+            "--profile:build",
+            profile,
+            "--profile:host",
+            profile,
+            "--format",
+            "json",
+        ],
+    }
+
+
+def benchmark_driver(name, operations, repeat, cwd):
+    start = time.perf_counter()
+    driver = get_conan_driver(name)
+    setup_time = time.perf_counter() - start
+
+    result = {"setup": setup_time}
+    for operation, command in operations.items():
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            proc = driver.run(command, cwd=cwd, stderr=subprocess.PIPE)
+            durations.append(time.perf_counter() - start)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{' '.join(command)} failed:\n{proc.stderr}")
+        result[operation] = sum(durations) / len(durations)
+    return result
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the per command overhead of the Conan drivers"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Number of runs per operation",
+    )
+    parser.add_argument(
+        "--conan-home",
+        type=Path,
+        default=None,
+        help="Conan home to use. Defaults to a temporary directory",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    root_path = get_root_path()
+    operations = get_operations(root_path, get_profiles_path())
+
+    with tempfile.TemporaryDirectory(prefix="conan-home-") as tmp_path:
+        os.environ["CONAN_HOME"] = str(args.conan_home or tmp_path)
+        results = {
+            name: benchmark_driver(name, operations, args.repeat, root_path)
+            for name in sorted(CONAN_DRIVERS)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+
+    print(f"{'operation':<12}" + "".join(f"{name:>14}" for name in results))
+    for operation in ["setup", *operations]:
+        print(
+            f"{operation:<12}"
+            + "".join(
+                f"{result[operation] * 1000:>12.1f}ms" for result in results.values()
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
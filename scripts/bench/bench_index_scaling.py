@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from definitions import get_profiles_path
+from list_build_matrix import get_build_matrices, get_build_matrix
+from list_package_references import (
+    get_modified_files,
+    get_references_in_files,
+    get_selected_packages,
+)
+from package_index import PackageIndex, get_package_infos
+from recipe_graph import (
+    get_recipe_graph,
+    get_topological_layers,
+    get_transitive_dependents,
+)
+from common import (
+    commit_tree,
+    generate_recipes,
+    generate_selection_config,
+    measure,
+    touch_recipes,
+)
+
+COLUMNS = [
+    "package_infos_cold",
+    "package_infos_warm",
+    "selected_packages",
+    "build_matrices",
+    "build_matrix",
+    "graph_cold",
+    "graph_warm",
+    "topological_layers",
+    "change_detection",
+]
+
+
+def parse_size(size):
+    packages, versions = size.lower().split("x")
+    return int(packages), int(versions)
+
+
+def benchmark(package_count, version_count, rule_count, changed_count, profiles_path):
+    with tempfile.TemporaryDirectory() as root:
+        root_path = Path(root)
+        recipes_path = root_path / "recipes"
+        cache_path = root_path / ".cache"
+        packages = generate_recipes(root_path, package_count, version_count)
+        selection_config = root_path / "defaults.yaml"
+        generate_selection_config(selection_config, packages, rule_count)
+        base_commit_id = commit_tree(root_path, "base")
+        touch_recipes(root_path, packages, changed_count)
+        head_commit_id = commit_tree(root_path, "change")
+
+        index_path = cache_path / "package-index.json"
+        package_infos_cold, package_infos = measure(
+            get_package_infos, root_path, recipes_path, index_path
+        )
+        package_infos_warm, _ = measure(
+            get_package_infos, root_path, recipes_path, index_path
+        )
+        package_index = PackageIndex(package_infos)
+        references = package_index.references()
+
+        selected_packages_time, selected_packages = measure(
+            get_selected_packages, references, selection_config, [], []
+        )
+        build_matrices_time, build_matrices = measure(
+            get_build_matrices,
+            selected_packages,
+            selection_config,
+            [],
+            [],
+            profiles_path,
+        )
+        build_matrix_time, _ = measure(
+            lambda: [
+                get_build_matrix(reference, selection_config, [], [], profiles_path)
+                for reference in selected_packages
+            ]
+        )
+
+        graph_path = cache_path / "recipe-graph.json"
+        graph_cold, graph = measure(
+            get_recipe_graph, package_index, root_path, graph_path
+        )
+        graph_warm, _ = measure(get_recipe_graph, package_index, root_path, graph_path)
+        layers_time, layers = measure(get_topological_layers, graph)
+
+        def detect_changes():
+            with contextlib.redirect_stdout(io.StringIO()):
+                files = get_modified_files(
+                    root_path,
+                    base_commit_id=base_commit_id,
+                    head_commit_id=head_commit_id,
+                )
+            return get_transitive_dependents(
+                graph, get_references_in_files(package_index, files)
+            )
+
+        change_detection, affected = measure(detect_changes)
+
+    return {
+        "packages": package_count,
+        "versions": len(references),
+        "rules": rule_count,
+        "selected": len(selected_packages),
+        "configs": sum(len(configs) for configs in build_matrices.values()),
+        "layers": len(layers),
+        "affected": len(affected),
+        "package_infos_cold": package_infos_cold,
+        "package_infos_warm": package_infos_warm,
+        "selected_packages": selected_packages_time,
+        "build_matrices": build_matrices_time,
+        "build_matrix": build_matrix_time,
+        "graph_cold": graph_cold,
+        "graph_warm": graph_warm,
+        "topological_layers": layers_time,
+        "change_detection": change_detection,
+    }
+
+
+def get_commit_id():
+    proc = subprocess.run(
+        ["git", "rev-parse", "HEAD"],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True,
+    )
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Time the index scripts on synthetic recipe trees of growing size"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        type=parse_size,
+        default=[(50, 10), (200, 20), (500, 20)],
+        help="Tree sizes as PACKAGESxVERSIONS, e.g. 200x20",
+    )
+    parser.add_argument(
+        "--rules",
+        type=int,
+        default=50,
+        help="Number of rules in the synthetic selection config",
+    )
+    parser.add_argument(
+        "--changed",
+        type=int,
+        default=5,
+        help="Number of packages modified for change detection",
+    )
+    parser.add_argument(
+        "--profiles-path",
+        type=Path,
+        default=get_profiles_path(),
+        help="Path to the conan profiles the platforms are discovered from",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Also write the results as JSON to this file, to compare runs over time",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    results = [
+        benchmark(
+            package_count, version_count, args.rules, args.changed, args.profiles_path
+        )
+        for package_count, version_count in args.sizes
+    ]
+    report = {
+        "time": time.time(),
+        "commit": get_commit_id(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return 0
+
+    print(f"{'size':>10}" + "".join(f"{column:>20}" for column in COLUMNS))
+    for result in results:
+        size = f"{result['packages']}x{result['versions'] // result['packages']}"
+        print(
+            f"{size:>10}"
+            + "".join(f"{result[column] * 1000:>18.2f}ms" for column in COLUMNS)
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import get_synthetic_package_infos, measure
+from package_index import PackageIndex
+
+
+def select_with_lists(package_infos, selected_packages):
+    """The filter the scripts used before ``PackageIndex``."""
+    return [
+        package_info
+        for package_info in package_infos
+        if package_info["package_reference"] in selected_packages
+    ]
+
+
+def benchmark(version_count):
+    package_infos = get_synthetic_package_infos(version_count, versions_per_package=50)
+    # select every other version, as a selection config would
+    selected_packages = [
+        package_info["package_reference"] for package_info in package_infos[::2]
+    ]
+
+    build_time, package_index = measure(PackageIndex, package_infos)
+    list_select_time, _ = measure(select_with_lists, package_infos, selected_packages)
+    index_select_time, _ = measure(package_index.select, selected_packages)
+    index_lookup_time, _ = measure(
+        lambda: [package_index.get(reference) for reference in selected_packages]
+    )
+
+    return {
+        "versions": version_count,
+        "list_select": list_select_time,
+        "index_build": build_time,
+        "index_select": index_select_time,
+        "index_lookup": index_lookup_time,
+    }
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Compare list based package selection with PackageIndex"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        type=int,
+        default=[100, 1000, 10000],
+        help="Numbers of synthetic package versions",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    results = [benchmark(size) for size in args.sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+
+    columns = ["list_select", "index_build", "index_select", "index_lookup"]
+    print(f"{'versions':>10}" + "".join(f"{column:>15}" for column in columns))
+    for result in results:
+        print(
+            f"{result['versions']:>10}"
+            + "".join(f"{result[column] * 1000:>13.2f}ms" for column in columns)
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import argparse
+import fnmatch
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import get_synthetic_references, get_synthetic_rules, measure
+from list_build_matrix import get_build_matrices, get_build_matrix
+from selection import BuildMatrixSelector, item_to_list
+
+PLATFORM_PROFILES = [
+    *[
+        (f"android-{api_level}-{arch}", f"android-{api_level}-{arch}")
+        for api_level in (21, 23, 35)
+        for arch in ("armv7", "armv8", "x86", "x86_64")
+    ],
+    ("macos-15", "macos-15-armv8-apple-clang-14"),
+    ("macos-26", "macos-26-armv8-apple-clang-14"),
+    ("ubuntu-24.04", "ubuntu-24.04-x86_64-gcc-14"),
+    ("ubuntu-24.04", "ubuntu-24.04-x86_64-clang-18"),
+    ("windows-2022", "windows-2022-x86_64-msvc-1940"),
+]
+
+
+def legacy_is_selected(package_reference, platform, profile, rules):
+    """The rule evaluation ``get_build_matrix`` used before ``BuildMatrixSelector``."""
+    rule_excluded = False
+    for rule in rules:
+        if all(
+            not fnmatch.fnmatch(package_reference, pattern)
+            for pattern in item_to_list(rule.get("packages", "*"))
+        ):
+            continue
+        if all(
+            not fnmatch.fnmatch(platform, pattern)
+            for pattern in item_to_list(rule.get("platforms", "*"))
+        ):
+            continue
+        if all(
+            not fnmatch.fnmatch(profile, pattern)
+            for pattern in item_to_list(rule.get("profiles", "*"))
+        ):
+            continue
+        rule_excluded = rule["type"] == "exclude"
+    return not rule_excluded
+
+
+def benchmark(reference_count, rule_count):
+    references = get_synthetic_references(reference_count)
+    packages = sorted({reference.split("/")[0] for reference in references})
+    rules = get_synthetic_rules(packages, rule_count)
+    tuples = [
+        (reference, platform, profile)
+        for reference in references
+        for platform, profile in PLATFORM_PROFILES
+    ]
+
+    def run_legacy():
+        for reference, platform, profile in tuples:
+            legacy_is_selected(reference, platform, profile, rules)
+
+    def run_selector():
+        selector = BuildMatrixSelector([], [], [], [], rules)
+        for reference, platform, profile in tuples:
+            selector(reference, platform, profile)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml") as selection_config:
+        yaml.safe_dump(
+            {
+                "packages": {"include": "*"},
+                "platforms": {"include": "*"},
+                "profiles": {"include": "*"},
+                "rules": rules,
+            },
+            selection_config,
+        )
+        selection_config.flush()
+
+        def run_build_matrix():
+            for reference in references:
+                get_build_matrix(reference, selection_config.name)
+
+        def run_build_matrices():
+            get_build_matrices(references, selection_config.name)
+
+        # The batch runs first, so it does not reuse memoized decisions
+        build_matrices_time, _ = measure(run_build_matrices)
+        build_matrix_time, _ = measure(run_build_matrix)
+    legacy_time, _ = measure(run_legacy)
+    selector_time, _ = measure(run_selector)
+
+    return {
+        "references": reference_count,
+        "rules": rule_count,
+        "legacy_rules": legacy_time,
+        "selector_rules": selector_time,
+        "get_build_matrix": build_matrix_time,
+        "get_build_matrices": build_matrices_time,
+    }
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark build matrix selection with many references and rules"
+    )
+    parser.add_argument(
+        "--references",
+        nargs="*",
+        type=int,
+        default=[100, 1000],
+        help="Numbers of synthetic package references",
+    )
+    parser.add_argument(
+        "--rules",
+        nargs="*",
+        type=int,
+        default=[10, 100],
+        help="Numbers of synthetic selection rules",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    results = [
+        benchmark(reference_count, rule_count)
+        for rule_count in args.rules
+        for reference_count in args.references
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+
+    columns = [
+        "legacy_rules",
+        "selector_rules",
+        "get_build_matrix",
+        "get_build_matrices",
+    ]
+    print(
+        f"{'references':>10}{'rules':>7}"
+        + "".join(f"{column:>20}" for column in columns)
+    )
+    for result in results:
+        print(
+            f"{result['references']:>10}{result['rules']:>7}"
+            + "".join(f"{result[column] * 1000:>18.1f}ms" for column in columns)
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
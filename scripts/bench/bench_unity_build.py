@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from build_timing import run_timed
+from definitions import get_recipes_path, get_root_path
+from package_index import get_package_index
+
+DEFAULT_PACKAGES = [
+    "poppler",
+    "fontforge",
+    "pdf2htmlex",
+    "odrcore",
+    "openlibm",
+    "glib",
+    "cairo",
+    "fontconfig",
+]
+DEFAULT_PROFILE = "ubuntu-24.04-x86_64-clang-18"
+TIMED_PHASES = ["configure", "build"]
+
+
+def get_variants(batch_sizes):
+    """A build without unity build, then one per batch size."""
+    return [("off", None)] + [(f"on ({size})", size) for size in batch_sizes]
+
+
+def get_create_command(package_info, root_path, profile, batch_size, jobs):
+    command = [
+        "conan",
+        "create",
+        package_info.conanfile,
+        "--version",
+        package_info.version,
+        "--profile:build",
+        profile,
+        "--profile:host",
+        profile,
+        "--build",
+        "missing",
+        "--build",
+        package_info.reference,
+        "--options",
+        f"{package_info.package}/*:unity_build={batch_size is not None}",
+    ]
+    if batch_size is not None:
+        command += ["--conf", f"user.unity_build:batch_size={batch_size}"]
+    if jobs is not None:
+        command += ["--conf", f"tools.build:jobs={jobs}"]
+    if (Path(root_path) / package_info.directory / "conan.lock").is_file():
+        command += ["--lockfile", "conan.lock"]
+    return command
+
+
+def benchmark_package(package_info, root_path, profile, variants, repeat, jobs, log):
+    """Build ``package_info`` ``repeat`` times per variant, alternating between
+    the variants so slow drifts of the machine affect all of them alike.
+
+    Returns a dict mapping every variant to the median duration of the timed
+    phases, or ``None`` if a build failed.
+    """
+    durations = {name: {phase: [] for phase in TIMED_PHASES} for name, _ in variants}
+    for _ in range(repeat):
+        for name, batch_size in variants:
+            command = get_create_command(
+                package_info, root_path, profile, batch_size, jobs
+            )
+            print(f"... {package_info.reference} unity build {name}")
+            proc, timer = run_timed(
+                command, cwd=Path(root_path) / package_info.directory, log=log
+            )
+            if proc.returncode != 0:
+                print(f"Failed: {' '.join(command)}")
+                durations[name] = None
+                continue
+            if durations[name] is None:
+                continue
+            phases = timer.phases.get(package_info.reference, {})
+            for phase in TIMED_PHASES:
+                durations[name][phase].append(phases.get(phase, 0.0))
+
+    return {
+        name: (
+            None
+            if phases is None
+            else {phase: statistics.median(values) for phase, values in phases.items()}
+        )
+        for name, phases in durations.items()
+    }
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the build time of recipes with and without the unity_build option"
+    )
+    parser.add_argument(
+        "packages",
+        nargs="*",
+        default=DEFAULT_PACKAGES,
+        help="Package names or references. Names build their newest version",
+    )
+    parser.add_argument(
+        "--profile",
+        default=DEFAULT_PROFILE,
+        help="Host and build profile",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        nargs="+",
+        type=int,
+        default=[8],
+        help="Unity build batch sizes to compare",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of builds per variant",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Value of tools.build:jobs for the builds",
+    )
+    parser.add_argument(
+        "--ccache",
+        action="store_true",
+        help="Keep ccache enabled, which hides the compile time of repeated builds",
+    )
+    parser.add_argument(
+        "--log",
+        type=Path,
+        default=None,
+        help="Write the output of the builds to this file",
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--recipes-path",
+        type=Path,
+        default=get_recipes_path(),
+        help="Path to recipes directory",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    if not args.ccache:
+        os.environ["CCACHE_DISABLE"] = "1"
+
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    package_infos = []
+    for package in args.packages:
+        package_info = (
+            package_index.get(package)
+            if "/" in package
+            else package_index.newest(package)
+        )
+        if package_info is None:
+            print(f"Unknown package {package}")
+            return 1
+        package_infos.append(package_info)
+
+    variants = get_variants(args.batch_sizes)
+    log = open(args.log, "w") if args.log else None
+    try:
+        results = {
+            package_info.reference: benchmark_package(
+                package_info,
+                args.root_path,
+                args.profile,
+                variants,
+                args.repeat,
+                args.jobs,
+                log,
+            )
+            for package_info in package_infos
+        }
+    finally:
+        if log is not None:
+            log.close()
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(
+            f"{'reference':<48}{'unity build':<14}{'configure':>11}{'build':>10}{'speedup':>9}"
+        )
+        for reference, variant_results in results.items():
+            baseline = variant_results["off"]
+            for name, phases in variant_results.items():
+                if phases is None:
+                    print(f"{reference:<48}{name:<14}{'failed':>11}")
+                    continue
+                speedup = (
+                    f"{baseline['build'] / phases['build']:.2f}x"
+                    if baseline is not None and phases["build"]
+                    else "-"
+                )
+                print(
+                    f"{reference:<48}{name:<14}{phases['configure']:>10.1f}s"
+                    f"{phases['build']:>9.1f}s{speedup:>9}"
+                )
+
+    failed = any(
+        phases is None
+        for variant_results in results.values()
+        for phases in variant_results.values()
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
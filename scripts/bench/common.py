@@ -0,0 +1,184 @@
+import subprocess
+import time
+from pathlib import Path
+
+import yaml
+
+CONANFILE_TEMPLATE = """from conan import ConanFile
+from conan.tools.scm import Version
+
+
+class {class_name}Conan(ConanFile):
+    name = "{package}"
+    settings = "os", "arch", "compiler", "build_type"
+
+    def requirements(self):
+{requirements}
+"""
+
+
+def measure(function, *args):
+    """Call ``function`` once. Returns the duration and the result."""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def get_package_name(index):
+    return f"package{index:04d}"
+
+
+def get_versions(version_count):
+    return [f"{index // 10 + 1}.{index % 10}.0" for index in range(version_count)]
+
+
+def get_synthetic_references(reference_count, versions_per_package=10):
+    versions = get_versions(versions_per_package)
+    return [
+        f"{get_package_name(index // versions_per_package)}/"
+        f"{versions[index % versions_per_package]}"
+        for index in range(reference_count)
+    ]
+
+
+def get_synthetic_package_infos(reference_count, versions_per_package=10):
+    """Package infos as written to the index cache, without a recipes tree."""
+    package_infos = []
+    for reference in get_synthetic_references(reference_count, versions_per_package):
+        package, version = reference.split("/")
+        package_infos.append(
+            {
+                "package": package,
+                "version": version,
+                "package_reference": reference,
+                "directory": f"recipes/{package}/all",
+                "conanfile": "conanfile.py",
+                "test_conanfile": "test_package/conanfile.py",
+            }
+        )
+    return package_infos
+
+
+def get_synthetic_rules(packages, rule_count):
+    """``rule_count`` selection rules alternating between exclude and include."""
+    rules = []
+    for index in range(rule_count):
+        package = packages[index % len(packages)]
+        rules.append(
+            {
+                "type": "exclude" if index % 2 == 0 else "include",
+                "packages": [f"{package}/*", f"{package}/1.*"],
+                "platforms": ["windows*", "android-21-*", "macos-*"][index % 3],
+            }
+        )
+    return rules
+
+
+def get_folder(version, versions_per_folder):
+    """Versions share a folder in groups of ``versions_per_folder``."""
+    major, minor, _ = version.split(".")
+    return f"{major}.{int(minor) // versions_per_folder}"
+
+
+def write_conanfile(path, package, dependencies, newest_version):
+    lines = []
+    for dependency in dependencies:
+        lines.append(f'        self.requires("{dependency}/{newest_version}")')
+    # A version dependent requirement as found in real recipes
+    if dependencies:
+        lines.append('        if Version(self.version) >= "2.0.0":')
+        lines.append(f'            self.requires("{dependencies[0]}/{newest_version}")')
+    if not lines:
+        lines.append("        pass")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        CONANFILE_TEMPLATE.format(
+            class_name=package.capitalize(),
+            package=package,
+            requirements="\n".join(lines),
+        )
+    )
+
+
+def generate_recipes(
+    root_path, package_count, version_count, versions_per_folder=3, chain_depth=2
+):
+    """Write a ``recipes/`` tree of ``package_count`` x ``version_count`` versions.
+
+    Each package requires the newest version of the ``chain_depth`` packages
+    before it, so the tree forms dependency chains. Returns the list of package
+    names.
+    """
+    recipes_path = Path(root_path) / "recipes"
+    versions = get_versions(version_count)
+    packages = [get_package_name(index) for index in range(package_count)]
+
+    for index, package in enumerate(packages):
+        dependencies = packages[max(0, index - chain_depth) : index]
+        package_path = recipes_path / package
+        config = {"versions": {}}
+        for version in versions:
+            folder = get_folder(version, versions_per_folder)
+            config["versions"][version] = {"folder": folder}
+            conanfile = package_path / folder / "conanfile.py"
+            if not conanfile.exists():
+                write_conanfile(conanfile, package, dependencies, versions[-1])
+        package_path.mkdir(parents=True, exist_ok=True)
+        with open(package_path / "config.yml", "w") as f:
+            yaml.safe_dump(config, f)
+
+    return packages
+
+
+def generate_selection_config(path, packages, rule_count):
+    """Write a ``defaults.yaml`` like selection config with ``rule_count`` rules."""
+    config = {
+        "packages": {
+            "include": "*",
+            "exclude": [f"{packages[-1]}/*"],
+        },
+        "platforms": {"include": "*"},
+        "profiles": {"include": "*"},
+        "rules": get_synthetic_rules(packages, rule_count),
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def git(root_path, *args):
+    subprocess.run(
+        ["git", *args],
+        cwd=root_path,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def commit_tree(root_path, message):
+    """Commit the whole tree, creating the repository if needed. Returns the
+    commit id."""
+    root_path = Path(root_path)
+    if not (root_path / ".git").is_dir():
+        git(root_path, "init", "--quiet")
+        git(root_path, "config", "user.email", "bench@example.com")
+        git(root_path, "config", "user.name", "bench")
+    git(root_path, "add", "--all")
+    git(root_path, "commit", "--quiet", "--allow-empty", "-m", message)
+    return subprocess.run(
+        ["git", "rev-parse", "HEAD"],
+        cwd=root_path,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def touch_recipes(root_path, packages, count):
+    """Modify the first version folder of ``count`` packages."""
+    recipes_path = Path(root_path) / "recipes"
+    for package in packages[:count]:
+        conanfile = sorted((recipes_path / package).glob("*/conanfile.py"))[0]
+        with open(conanfile, "a") as f:
+            f.write("\n# modified\n")
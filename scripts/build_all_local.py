@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from build_journal import (
+    COMPLETED,
+    FAILED,
+    BuildJournal,
+    get_default_journal_path,
+    get_file_hash,
+)
+from build_timing import append_history, get_default_history_path, run_timed
+from conan_export_all_packages import (
+    export_packages,
+    get_closure,
+    get_default_export_manifest_path,
+    get_export_hash,
+    is_python_require,
+)
+from definitions import (
+    get_recipes_path,
+    get_root_path,
+    get_default_selection_config,
+    get_profiles_path,
+    get_cache_path,
+)
+from list_build_matrix import get_build_matrices
+from list_package_references import get_selected_packages
+from package_index import get_package_index
+from recipe_graph import get_default_graph_cache_path, get_recipe_graph
+
+LOCAL_PLATFORMS = ["ubuntu-*", "android-*"]
+
+
+def get_default_log_path():
+    return get_cache_path() / "build-logs"
+
+
+def get_build_units(package_infos, build_matrices, graph):
+    """One unit per package and host profile, with the units it waits for.
+
+    A unit depends on the units building its dependencies of this index for
+    the same host profile. Returns a dict mapping ``(reference, host_profile)``
+    to ``(package_info, config, dependencies)``.
+    """
+    units = {}
+    for package_info in package_infos:
+        for config in build_matrices[package_info.reference]:
+            units[(package_info.reference, config["host_profile"])] = (
+                package_info,
+                config,
+            )
+
+    return {
+        (reference, host_profile): (
+            package_info,
+            config,
+            {
+                (dependency, host_profile)
+                for dependency in graph.get(reference, [])
+                if (dependency, host_profile) in units
+            },
+        )
+        for (reference, host_profile), (package_info, config) in units.items()
+    }
+
+
+def create_package(
+    package_info,
+    config,
+    root_path,
+    build_jobs,
+    build="missing",
+    log_path=None,
+    history_path=None,
+    dry_run=False,
+):
+    """Run ``conan create`` for one unit, writing its output to a log file.
+
+    The duration of every phase of every package built is appended to
+    ``history_path``.
+    """
+    directory = Path(root_path) / package_info.directory
+    command = [
+        "conan",
+        "create",
+        package_info.conanfile,
+        "--version",
+        package_info.version,
+        "--profile:build",
+        config["build_profile"],
+        "--profile:host",
+        config["host_profile"],
+        "--build",
+        build,
+        "--conf",
+        f"tools.build:jobs={build_jobs}",
+    ]
+    if (directory / "conan.lock").is_file():
+        command += ["--lockfile", "conan.lock"]
+
+    if dry_run:
+        return subprocess.CompletedProcess(args=command, returncode=0), command
+
+    log_file = Path(log_path) / (
+        f"{package_info.package}-{package_info.version}-{config['host_profile']}.log"
+    )
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "w") as log:
+        proc, timer = run_timed(command, cwd=directory, log=log)
+    if history_path is not None:
+        append_history(history_path, config["host_profile"], timer, proc.returncode)
+    return proc, command
+
+
+def get_external_builds(units, root_path, build="missing", dry_run=False, completed=()):
+    """The binaries ``units`` would build that no unit builds itself.
+
+    These are packages outside this index, packages of this index that are
+    not selected or not in the build matrix of the host profile, and anything
+    needed in the build context. ``conan graph build-order`` runs for one unit
+    not in ``completed`` after the other, as it may download recipes into the
+    Conan cache. Binaries needed by several units, e.g. tool requires for the
+    same build profile, are listed once, after the binaries they depend on.
+    Returns a list of ``(unit, build_args)``, or ``None`` if the build order
+    of a unit could not be computed.
+    """
+    builds = {}
+    for unit, (package_info, config, _) in sorted(units.items()):
+        if unit in completed:
+            continue
+        directory = Path(root_path) / package_info.directory
+        command = [
+            "conan",
+            "graph",
+            "build-order",
+            package_info.conanfile,
+            "--version",
+            package_info.version,
+            "--profile:build",
+            config["build_profile"],
+            "--profile:host",
+            config["host_profile"],
+            "--build",
+            build,
+            "--order-by",
+            "configuration",
+            "--reduce",
+            "--format",
+            "json",
+        ]
+        if (directory / "conan.lock").is_file():
+            command += ["--lockfile", "conan.lock"]
+
+        if dry_run:
+            print("Dry run, not executing command: " + " ".join(command))
+            continue
+        proc = subprocess.run(command, cwd=directory, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr)
+            print(f"Failed {unit[0]} for {unit[1]}: " + " ".join(command))
+            return None
+
+        for level in json.loads(proc.stdout)["order"]:
+            for package in level:
+                reference = package["ref"].split("#")[0]
+                if package["context"] == "host" and (reference, unit[1]) in units:
+                    continue
+                builds.setdefault(package["pref"], (unit, package["build_args"]))
+    return list(builds.values())
+
+
+def build_external_packages(
+    builds, units, root_path, cpus, log_path=None, history_path=None, dry_run=False
+):
+    """Build the binaries returned by ``get_external_builds`` one at a time.
+
+    The Conan cache is not safe for concurrent writes, and units sharing a
+    missing dependency would otherwise build it at the same time. Stops at the
+    first failed build and returns its return code, or 0 if every binary was
+    built.
+    """
+    for unit, build_args in builds:
+        package_info, config, _ = units[unit]
+        directory = Path(root_path) / package_info.directory
+        build_args = shlex.split(build_args)
+        reference = build_args[0].split("=", 1)[1].split("#")[0]
+        command = [
+            "conan",
+            "install",
+            *build_args,
+            "--profile:build",
+            config["build_profile"],
+            "--profile:host",
+            config["host_profile"],
+            "--conf",
+            f"tools.build:jobs={cpus}",
+        ]
+        if (directory / "conan.lock").is_file():
+            command += ["--lockfile", "conan.lock"]
+
+        if dry_run:
+            print("Dry run, not executing command: " + " ".join(command))
+            continue
+
+        print(f"Build {reference} for {unit[1]} with {cpus} jobs")
+        log_file = Path(log_path) / (
+            f"{reference.replace('/', '-')}-{config['host_profile']}.log"
+        )
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with open(log_file, "w") as log:
+            proc, timer = run_timed(command, cwd=directory, log=log)
+        if history_path is not None:
+            append_history(history_path, config["host_profile"], timer, proc.returncode)
+        if proc.returncode != 0:
+            print(f"Failed {reference} for {unit[1]}: " + " ".join(command))
+            return proc.returncode
+        print(f"Built {reference} for {unit[1]} in {time.perf_counter() - start:.0f}s")
+    return 0
+
+
+def build_units(
+    units,
+    root_path,
+    cpus,
+    max_builds,
+    build="missing",
+    log_path=None,
+    history_path=None,
+    dry_run=False,
+    journal=None,
+    completed=(),
+):
+    """Build all ``units``, each as soon as the units it depends on are done.
+
+    At most ``max_builds`` builds run at a time. The ``cpus`` are split
+    between the builds started together, taking into account the jobs of the
+    builds already running. Units depending on a failed unit are skipped.
+    Units in ``completed`` count as built without building them again, and
+    the outcome of every build is recorded in ``journal``.
+    Returns a dict mapping every unit to ``built``, ``failed`` or ``skipped``.
+    """
+    waiting = {unit: set(dependencies) for unit, (_, _, dependencies) in units.items()}
+    results = {}
+    running = {}
+
+    def start_ready_units(executor):
+        ready = sorted(
+            unit for unit, dependencies in waiting.items() if not dependencies
+        )
+        ready = ready[: max_builds - len(running)]
+        if not ready:
+            return
+        free_cpus = cpus - sum(jobs for _, jobs, _ in running.values())
+        build_jobs = max(1, free_cpus // len(ready))
+        for unit in ready:
+            del waiting[unit]
+            package_info, config, _ = units[unit]
+            print(f"Start {unit[0]} for {unit[1]} with {build_jobs} jobs")
+            future = executor.submit(
+                create_package,
+                package_info,
+                config,
+                root_path,
+                build_jobs,
+                build=build,
+                log_path=log_path,
+                history_path=history_path,
+                dry_run=dry_run,
+            )
+            running[future] = (unit, build_jobs, time.perf_counter())
+
+    def finish(unit, result):
+        results[unit] = result
+        for dependent, dependencies in list(waiting.items()):
+            if dependent not in waiting or unit not in dependencies:
+                continue
+            if result == "built":
+                dependencies.discard(unit)
+            else:
+                print(f"Skip {dependent[0]} for {dependent[1]}, {unit[0]} {result}")
+                del waiting[dependent]
+                finish(dependent, "skipped")
+
+    for unit in sorted(completed):
+        if unit in waiting:
+            print(f"Already built {unit[0]} for {unit[1]}")
+            del waiting[unit]
+            finish(unit, "built")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_builds) as executor:
+        start_ready_units(executor)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit, _, unit_start = running.pop(future)
+                proc, command = future.result()
+                duration = time.perf_counter() - unit_start
+                if dry_run:
+                    print("Dry run, not executing command: " + " ".join(command))
+                if proc.returncode == 0:
+                    print(f"Built {unit[0]} for {unit[1]} in {duration:.0f}s")
+                    finish(unit, "built")
+                else:
+                    print(f"Failed {unit[0]} for {unit[1]}: " + " ".join(command))
+                    finish(unit, "failed")
+                if journal is not None and not dry_run:
+                    journal.record(
+                        "build",
+                        *unit,
+                        COMPLETED if proc.returncode == 0 else FAILED,
+                        duration,
+                    )
+            start_ready_units(executor)
+
+    for unit in waiting:
+        results[unit] = "skipped"
+
+    counts = {
+        result: sum(1 for value in results.values() if value == result)
+        for result in ("built", "failed", "skipped")
+    }
+    print(
+        f"Built {counts['built']}, failed {counts['failed']}, "
+        f"skipped {counts['skipped']} of {len(units)} units "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return results
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Build all selected packages for the locally runnable profiles in dependency order"
+    )
+    parser.add_argument(
+        "--include-packages",
+        nargs="*",
+        default=[],
+        help="Include patterns for package selection",
+    )
+    parser.add_argument(
+        "--exclude-packages",
+        nargs="*",
+        default=[],
+        help="Exclude patterns for package selection",
+    )
+    parser.add_argument(
+        "--include-platforms",
+        nargs="*",
+        default=LOCAL_PLATFORMS,
+        help="Include patterns for platform selection",
+    )
+    parser.add_argument(
+        "--exclude-platforms",
+        nargs="*",
+        default=[],
+        help="Exclude patterns for platform selection",
+    )
+    parser.add_argument(
+        "--selection-config",
+        type=Path,
+        default=None,
+        help=f"Path to selection config file. Unused default: {get_default_selection_config()}",
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--recipes-path",
+        type=Path,
+        default=get_recipes_path(),
+        help="Path to recipes directory",
+    )
+    parser.add_argument(
+        "--profiles-path",
+        type=Path,
+        default=get_profiles_path(),
+        help="Path to the conan profiles the platforms are discovered from",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of CPUs shared by all concurrent builds",
+    )
+    parser.add_argument(
+        "--max-builds",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent builds",
+    )
+    parser.add_argument(
+        "--build",
+        default="missing",
+        help="Build policy for the dependencies no unit builds, which are built one at a time before the parallel builds",
+    )
+    parser.add_argument(
+        "--log-path",
+        type=Path,
+        default=get_default_log_path(),
+        help="Directory for the output of every build",
+    )
+    parser.add_argument(
+        "--timing-history",
+        type=Path,
+        default=get_default_history_path(),
+        help="Path to the history of phase durations, see build_timing.py",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=get_default_journal_path(),
+        help="Path to the build journal recording completed builds",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip builds the journal records as completed for the same recipe and lockfile",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Perform a dry run without executing commands",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    selected_packages = get_selected_packages(
+        package_index.references(),
+        args.selection_config,
+        args.include_packages,
+        args.exclude_packages,
+    )
+    package_infos = package_index.select(selected_packages)
+
+    graph = get_recipe_graph(
+        package_index, args.root_path, get_default_graph_cache_path()
+    )
+
+    # The build order of every unit is computed before any build, so all
+    # recipes of the closure are exported first, python-requires included.
+    # These are only in the build matrix of one profile and have no binaries.
+    closure = package_index.select(
+        get_closure(package_index, selected_packages, args.root_path, graph)
+    )
+    print(f"Export {len(closure)} recipes")
+    if export_packages(
+        closure,
+        args.root_path,
+        dry_run=args.dry_run,
+        manifest_path=get_default_export_manifest_path(),
+    ):
+        return 1
+    package_infos = [
+        package_info
+        for package_info in package_infos
+        if not is_python_require(package_info, args.root_path)
+    ]
+    build_matrices = get_build_matrices(
+        selected_packages,
+        args.selection_config,
+        args.include_platforms,
+        args.exclude_platforms,
+        args.profiles_path,
+    )
+    units = get_build_units(package_infos, build_matrices, graph)
+
+    with BuildJournal(args.journal) as journal:
+        completed = journal.start(
+            "build",
+            [
+                (
+                    reference,
+                    host_profile,
+                    get_export_hash(package_info, args.root_path),
+                    get_file_hash(
+                        Path(args.root_path) / package_info.directory / "conan.lock"
+                    ),
+                )
+                for (reference, host_profile), (package_info, _, _) in units.items()
+            ],
+            resume=args.resume,
+        )
+
+        external_builds = get_external_builds(
+            units, args.root_path, args.build, args.dry_run, completed
+        )
+        if external_builds is None:
+            return 1
+        print(f"Build {len(external_builds)} packages no unit builds")
+        if build_external_packages(
+            external_builds,
+            units,
+            args.root_path,
+            args.cpus,
+            log_path=args.log_path,
+            history_path=args.timing_history,
+            dry_run=args.dry_run,
+        ):
+            return 1
+
+        # Everything no unit builds is built now, so the units only build
+        # their own package and never the same dependency at the same time
+        results = build_units(
+            units,
+            args.root_path,
+            cpus=args.cpus,
+            max_builds=args.max_builds,
+            build="missing",
+            log_path=args.log_path,
+            history_path=args.timing_history,
+            dry_run=args.dry_run,
+            journal=journal,
+            completed=completed,
+        )
+
+    return 0 if all(result == "built" for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from definitions import get_conan_home_path
+
+STEPS = ["source", "build", "package"]
+
+
+def get_default_build_cost_path():
+    return get_conan_home_path() / "build-cost.jsonl"
+
+
+def load_build_costs(build_cost_path):
+    """The records written by the ``hook_build_cost.py`` conan hook."""
+    records = []
+    try:
+        with open(build_cost_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def get_ccache_hit_rate(ccache):
+    """Share of cacheable compilations served from the cache, or ``None``."""
+    hits = ccache.get("direct_cache_hit", 0) + ccache.get("preprocessed_cache_hit", 0)
+    misses = ccache.get("cache_miss", 0)
+    if hits + misses == 0:
+        return None
+    return hits / (hits + misses)
+
+
+def aggregate_build_costs(records):
+    """Combine the step records of the latest build of every package.
+
+    Returns a list of dicts per ``(reference, package_id, profile)`` with the
+    wall and CPU time of every step, the peak RSS, the ccache counters of the
+    build step and the package size. The source step is shared by all
+    package ids of a recipe revision and is attributed to each of them.
+    """
+    sources = {}
+    builds = {}
+    for record in sorted(records, key=lambda record: record["time"]):
+        if record["step"] == "source":
+            sources[record["reference"]] = record
+            continue
+        key = (record["reference"], record["package_id"], record["profile"])
+        if record["step"] == "build":
+            # A new build of the same package replaces the previous one
+            builds[key] = {}
+        builds.setdefault(key, {})[record["step"]] = record
+
+    summaries = []
+    for (reference, package_id, profile), steps in sorted(
+        builds.items(), key=lambda item: tuple(str(value) for value in item[0])
+    ):
+        if reference in sources:
+            steps = {"source": sources[reference], **steps}
+        build = steps.get("build", {})
+        summaries.append(
+            {
+                "reference": reference,
+                "package_id": package_id,
+                "profile": profile,
+                "success": all(step.get("success", True) for step in steps.values()),
+                "wall_time": {step: steps[step]["wall_time"] for step in steps},
+                "cpu_time": {step: steps[step]["cpu_time"] for step in steps},
+                "peak_rss": max(
+                    (step["peak_rss"] or 0 for step in steps.values()), default=0
+                ),
+                "ccache": build.get("ccache", {}),
+                "package_size": steps.get("package", {}).get("package_size"),
+            }
+        )
+    return summaries
+
+
+def format_size(size):
+    if size is None:
+        return "-"
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Summarize the build cost recorded by the conan hook per package"
+    )
+    parser.add_argument(
+        "--build-cost",
+        type=Path,
+        default=get_default_build_cost_path(),
+        help="Path to the records of the build cost hook",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the summary as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    summaries = aggregate_build_costs(load_build_costs(args.build_cost))
+
+    if args.json:
+        print(json.dumps(summaries, indent=4))
+        return 0
+
+    print(
+        f"{'reference':<40}{'profile':<32}{'wall':>8}{'cpu':>8}{'rss':>10}{'ccache':>8}{'size':>10}"
+    )
+    for summary in summaries:
+        wall_time = sum(summary["wall_time"].values())
+        cpu_time = sum(value or 0 for value in summary["cpu_time"].values())
+        hit_rate = get_ccache_hit_rate(summary["ccache"])
+        hit_rate = "-" if hit_rate is None else f"{hit_rate:.0%}"
+        status = "" if summary["success"] else " (failed)"
+        print(
+            f"{summary['reference'] + status:<40}{summary['profile']:<32}"
+            f"{wall_time:>7.0f}s{cpu_time:>7.0f}s{format_size(summary['peak_rss']):>10}"
+            f"{hit_rate:>8}{format_size(summary['package_size']):>10}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from definitions import get_cache_path
+
+PENDING = "pending"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def get_default_journal_path():
+    return get_cache_path() / "build-journal.sqlite"
+
+
+def get_file_hash(path):
+    """SHA-256 of a file, or an empty string if it does not exist."""
+    path = Path(path)
+    if not path.is_file():
+        return ""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class BuildJournal:
+    """Persistent record of the units of long export, lock and build runs.
+
+    A unit is a ``(step, reference, profile)``. It is only considered done if it
+    completed for the same recipe revision and lockfile hash, so changed
+    recipes or lockfiles are redone when resuming.
+    """
+
+    def __init__(self, path=None):
+        path = Path(path or get_default_journal_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                step TEXT NOT NULL,
+                reference TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                revision TEXT NOT NULL,
+                lock_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                duration REAL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (step, reference, profile)
+            )
+            """)
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def start(self, step, units, resume=False):
+        """Register the units of a new run of ``step``.
+
+        ``units`` are ``(reference, profile, revision, lock_hash)`` tuples. With
+        ``resume`` units which already completed for the same revision and
+        lockfile hash are kept. All other units become pending. Units of
+        previous runs that are not part of this one are forgotten.
+
+        Returns the set of ``(reference, profile)`` that are already completed.
+        """
+        rows = {
+            (reference, profile): (revision, lock_hash, status)
+            for reference, profile, revision, lock_hash, status in self._connection.execute(
+                "SELECT reference, profile, revision, lock_hash, status FROM units WHERE step = ?",
+                (step,),
+            )
+        }
+        keys = set()
+        completed = set()
+        now = time.time()
+        for reference, profile, revision, lock_hash in units:
+            key = (reference, profile)
+            keys.add(key)
+            if resume and rows.get(key) == (revision, lock_hash, COMPLETED):
+                completed.add(key)
+                continue
+            # The duration of the previous run is kept as an estimate
+            self._connection.execute(
+                """
+                INSERT INTO units
+                    (step, reference, profile, revision, lock_hash, status, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (step, reference, profile) DO UPDATE SET
+                    revision = excluded.revision,
+                    lock_hash = excluded.lock_hash,
+                    status = excluded.status,
+                    updated = excluded.updated
+                """,
+                (step, reference, profile, revision, lock_hash, PENDING, now),
+            )
+        self._connection.executemany(
+            "DELETE FROM units WHERE step = ? AND reference = ? AND profile = ?",
+            [(step, *key) for key in rows.keys() - keys],
+        )
+        self._connection.commit()
+        return completed
+
+    def record(self, step, reference, profile, status, duration=None, lock_hash=None):
+        """Store the outcome of one unit. ``lock_hash`` updates the hash recorded
+        at start, for steps which write the lockfile themselves."""
+        self._connection.execute(
+            """
+            UPDATE units SET
+                status = ?,
+                duration = COALESCE(?, duration),
+                lock_hash = COALESCE(?, lock_hash),
+                updated = ?
+            WHERE step = ? AND reference = ? AND profile = ?
+            """,
+            (status, duration, lock_hash, time.time(), step, reference, profile),
+        )
+        self._connection.commit()
+
+    def get_units(self, step=None):
+        query = "SELECT step, reference, profile, status, duration FROM units"
+        parameters = ()
+        if step is not None:
+            query += " WHERE step = ?"
+            parameters = (step,)
+        return self._connection.execute(
+            query + " ORDER BY step, reference, profile", parameters
+        ).fetchall()
+
+    def get_summary(self):
+        """Progress per step: unit counts by status and the estimated serial time
+        of the units not yet completed.
+
+        Units without a known duration are estimated with the mean duration of
+        the completed units of their step.
+        """
+        summary = {}
+        for step, _, _, status, duration in self.get_units():
+            entry = summary.setdefault(
+                step,
+                {PENDING: 0, COMPLETED: 0, FAILED: 0, "durations": [], "remaining": []},
+            )
+            entry[status] += 1
+            if status == COMPLETED and duration is not None:
+                entry["durations"].append(duration)
+            elif status != COMPLETED:
+                entry["remaining"].append(duration)
+
+        for entry in summary.values():
+            durations = entry.pop("durations")
+            remaining = entry.pop("remaining")
+            mean = sum(durations) / len(durations) if durations else 0.0
+            entry["estimated_remaining"] = sum(
+                mean if duration is None else duration for duration in remaining
+            )
+        return summary
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Show the progress of export, lock and build runs"
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=get_default_journal_path(),
+        help="Path to the build journal",
+    )
+    parser.add_argument(
+        "--step",
+        help="Only show this step",
+    )
+    parser.add_argument(
+        "--units",
+        action="store_true",
+        help="List every unit that is not completed",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    if not args.journal.is_file():
+        print(f"No journal at {args.journal}")
+        return 1
+
+    with BuildJournal(args.journal) as journal:
+        summary = journal.get_summary()
+        print(
+            f"{'step':<10}{'completed':>10}{'failed':>8}{'pending':>9}{'progress':>10}{'remaining':>12}"
+        )
+        for step, entry in sorted(summary.items()):
+            if args.step is not None and step != args.step:
+                continue
+            total = entry[COMPLETED] + entry[FAILED] + entry[PENDING]
+            print(
+                f"{step:<10}{entry[COMPLETED]:>10}{entry[FAILED]:>8}{entry[PENDING]:>9}"
+                f"{entry[COMPLETED] / total:>10.0%}{entry['estimated_remaining']:>11.0f}s"
+            )
+
+        if args.units:
+            for step, reference, profile, status, _ in journal.get_units(args.step):
+                if status != COMPLETED:
+                    print(f"{status:<10}{step:<10}{reference} {profile}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
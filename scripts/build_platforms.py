@@ -0,0 +1,101 @@
+import functools
+import re
+from pathlib import Path
+
+ANDROID_BUILD_MACHINE = "ubuntu-24.04"
+ANDROID_BUILD_PROFILE = "ubuntu-24.04-x86_64-clang-18"
+
+NDK_VERSION_PATTERN = re.compile(r'{%\s*set\s+ndk_version\s*=\s*"([^"]+)"\s*%}')
+
+# Order of the build matrix, which names and orders the CI jobs
+OS_ORDER = ["android", "macos", "ubuntu", "windows"]
+ANDROID_ARCH_ORDER = ["armv8", "armv7", "x86", "x86_64"]
+COMPILER_ORDER = ["gcc", "clang"]
+
+
+def get_profile_ndk_version(profile_path):
+    """The NDK version a profile is written for, or ``None``."""
+    with open(profile_path) as f:
+        match = NDK_VERSION_PATTERN.search(f.read())
+    return match.group(1) if match else None
+
+
+def get_platform_config(profile_path):
+    """The platform of a host profile and the config used to build for it.
+
+    Android profiles are named after their platform and are cross compiled on
+    Ubuntu. Every other profile builds for itself on the machine named by the
+    first two components of the profile name, e.g. ``macos-15``.
+    """
+    profile_path = Path(profile_path)
+    host_profile = profile_path.name
+
+    if host_profile.startswith("android-"):
+        config = {
+            "build_machine": ANDROID_BUILD_MACHINE,
+            "build_profile": ANDROID_BUILD_PROFILE,
+            "host_profile": host_profile,
+        }
+        ndk_version = get_profile_ndk_version(profile_path)
+        if ndk_version is not None:
+            config["ndk_version"] = ndk_version
+        return host_profile, config
+
+    platform = "-".join(host_profile.split("-")[:2])
+    return platform, {
+        "build_machine": platform,
+        "build_profile": host_profile,
+        "host_profile": host_profile,
+    }
+
+
+def _get_rank(order, value):
+    return order.index(value) if value in order else len(order)
+
+
+def get_profile_sort_key(host_profile):
+    """Sort key of a host profile in the build matrix.
+
+    Android comes first, newest API level first and ``armv8`` before the other
+    architectures, then macOS, Ubuntu with GCC before Clang and Windows.
+    """
+    components = host_profile.split("-")
+    os_rank = _get_rank(OS_ORDER, components[0])
+    if components[0] == "android":
+        return (
+            os_rank,
+            -int(components[1]),
+            _get_rank(ANDROID_ARCH_ORDER, components[2]),
+            host_profile,
+        )
+    compiler_rank = _get_rank(
+        COMPILER_ORDER, components[-2] if len(components) > 1 else ""
+    )
+    return (os_rank, 0, compiler_rank, host_profile)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_platform_configs(profiles_path):
+    profile_paths = [
+        profile_path
+        for profile_path in profiles_path.iterdir()
+        if profile_path.is_file()
+    ]
+    return tuple(
+        get_platform_config(profile_path)
+        for profile_path in sorted(
+            profile_paths,
+            key=lambda profile_path: get_profile_sort_key(profile_path.name),
+        )
+    )
+
+
+def get_platform_configs(profiles_path):
+    """``(platform, config)`` pairs for every profile in ``profiles_path``.
+
+    The profiles directory is only read once per process.
+    """
+    return [
+        (platform, dict(config))
+        for platform, config in _get_platform_configs(Path(profiles_path).resolve())
+    ]
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from definitions import get_cache_path
+
+# Output lines of ``conan create`` starting a phase, the phase lasts until the
+# next marker of the same package. ``None`` ends the last phase.
+PHASE_MARKERS = [
+    ("source", re.compile(r"^Calling source\(\)")),
+    ("generate", re.compile(r"^Calling generate\(\)")),
+    ("build", re.compile(r"^Calling build\(\)")),
+    (
+        "configure",
+        re.compile(
+            r"^(Running CMake\.configure\(\)|Meson configure cmd:|RUN: \S*configure\b)"
+        ),
+    ),
+    (
+        "build",
+        re.compile(r"^(Running CMake\.build\(\)|Meson build cmd:|RUN: (make|ninja)\b)"),
+    ),
+    ("package", re.compile(r"^Calling package\(\)")),
+    (None, re.compile(r"^Package '[0-9a-f]+' created")),
+]
+
+SCOPED_LINE = re.compile(r"^(?:conanfile\.py \()?([^\s:()]+/[^\s:()]+?)\)?: (.*)$")
+SCOPE_HEADER = re.compile(r"^(?:conanfile\.py \()?([^\s:()]+/[^\s:()]+?)\)?:$")
+RECIPE_REVISION = re.compile(r"^\s+([^\s#]+/[^\s#]+)#([0-9a-f]{32})\b")
+
+_history_lock = threading.Lock()
+
+
+def get_default_history_path():
+    return get_cache_path() / "build-timings.jsonl"
+
+
+class PhaseTimer:
+    """Turns timestamped ``conan create`` output into per phase durations.
+
+    Handles every package built by the command, including dependencies built
+    from source, with both plain (``pkg/1.0: message``) and scoped output.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.revisions = {}
+        self._current = {}
+        self._scope = None
+
+    def feed(self, line, timestamp):
+        line = line.rstrip("\n")
+        revision = RECIPE_REVISION.match(line)
+        if revision:
+            self.revisions.setdefault(revision.group(1), revision.group(2))
+            return
+
+        header = SCOPE_HEADER.match(line)
+        if header:
+            self._scope = header.group(1)
+            return
+        scoped = SCOPED_LINE.match(line)
+        if scoped:
+            reference, message = scoped.groups()
+        elif line.startswith("  ") and self._scope is not None:
+            reference, message = self._scope, line.strip()
+        else:
+            return
+
+        for phase, marker in PHASE_MARKERS:
+            if marker.match(message):
+                self._switch(reference, phase, timestamp)
+                return
+
+    def close(self, timestamp):
+        """End all phases still running, e.g. because the build failed."""
+        for reference in list(self._current):
+            self._switch(reference, None, timestamp)
+
+    def _switch(self, reference, phase, timestamp):
+        current = self._current.pop(reference, None)
+        if current is not None:
+            current_phase, start = current
+            phases = self.phases.setdefault(reference, {})
+            phases[current_phase] = phases.get(current_phase, 0.0) + timestamp - start
+        if phase is not None:
+            self._current[reference] = (phase, timestamp)
+
+
+def run_timed(command, cwd=None, log=None):
+    """Run ``command`` like ``subprocess.run`` and time the phases of its output.
+
+    The output is written to ``log`` if given. Returns the
+    ``CompletedProcess`` and the ``PhaseTimer``.
+    """
+    timer = PhaseTimer()
+    with subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    ) as proc:
+        for line in proc.stdout:
+            timer.feed(line, time.monotonic())
+            if log is not None:
+                log.write(line)
+    timer.close(time.monotonic())
+    return subprocess.CompletedProcess(args=command, returncode=proc.returncode), timer
+
+
+def append_history(history_path, profile, timer, returncode):
+    """Append one record per package timed by ``timer`` to the history file."""
+    history_path = Path(history_path)
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    with _history_lock, open(history_path, "a") as f:
+        for reference, phases in sorted(timer.phases.items()):
+            record = {
+                "time": now,
+                "reference": reference,
+                "profile": profile,
+                "revision": timer.revisions.get(reference, ""),
+                "success": returncode == 0,
+                "phases": {
+                    phase: round(duration, 3) for phase, duration in phases.items()
+                },
+            }
+            print(json.dumps(record, sort_keys=True), file=f)
+
+
+def load_history(history_path):
+    records = []
+    try:
+        with open(history_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def compare_history(records, threshold=20.0, window=5, min_duration=10.0):
+    """Phases of the latest build of every package and profile that got slower.
+
+    Successful builds are grouped by package name and profile, so version
+    bumps are compared against the builds of previous versions. The baseline
+    of a phase is the median of up to ``window`` builds before the latest one.
+    A phase is reported if it is more than ``threshold`` percent slower than
+    its baseline, ignoring phases where both take less than ``min_duration``
+    seconds.
+    """
+    builds = {}
+    for record in sorted(records, key=lambda record: record["time"]):
+        if not record.get("success"):
+            continue
+        package = record["reference"].split("/")[0]
+        builds.setdefault((package, record["profile"]), []).append(record)
+
+    regressions = []
+    for (package, profile), package_builds in sorted(builds.items()):
+        latest = package_builds[-1]
+        previous = package_builds[-1 - window : -1]
+        for phase, duration in sorted(latest["phases"].items()):
+            baseline_durations = [
+                build["phases"][phase] for build in previous if phase in build["phases"]
+            ]
+            if not baseline_durations:
+                continue
+            baseline = statistics.median(baseline_durations)
+            if max(baseline, duration) < min_duration:
+                continue
+            change = (
+                (duration - baseline) / baseline * 100 if baseline else float("inf")
+            )
+            if change > threshold:
+                regressions.append(
+                    {
+                        "reference": latest["reference"],
+                        "profile": profile,
+                        "revision": latest["revision"],
+                        "phase": phase,
+                        "duration": duration,
+                        "baseline": baseline,
+                        "baseline_builds": len(baseline_durations),
+                        "change": change,
+                    }
+                )
+    return regressions
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Report per phase build times recorded by the build scripts"
+    )
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=get_default_history_path(),
+        help="Path to the build timing history",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = subparsers.add_parser("show", help="List recorded builds")
+    show_parser.add_argument(
+        "--last",
+        type=int,
+        default=20,
+        help="Number of most recent records to show",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Flag phases slower than their rolling baseline"
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="Report phases more than this many percent slower than the baseline",
+    )
+    compare_parser.add_argument(
+        "--window",
+        type=int,
+        default=5,
+        help="Number of previous builds forming the baseline",
+    )
+    compare_parser.add_argument(
+        "--min-duration",
+        type=float,
+        default=10.0,
+        help="Ignore phases shorter than this many seconds",
+    )
+    compare_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the report as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    records = load_history(args.history)
+
+    if args.command == "show":
+        for record in records[-args.last :]:
+            phases = ", ".join(
+                f"{phase} {duration:.0f}s"
+                for phase, duration in record["phases"].items()
+            )
+            status = "" if record["success"] else " (failed)"
+            print(f"{record['reference']} {record['profile']}{status}: {phases}")
+        return 0
+
+    regressions = compare_history(
+        records,
+        threshold=args.threshold,
+        window=args.window,
+        min_duration=args.min_duration,
+    )
+
+    if args.json:
+        print(json.dumps(regressions, indent=4))
+    else:
+        print(
+            f"{'reference':<40}{'profile':<32}{'phase':<11}{'baseline':>10}{'latest':>10}{'change':>9}"
+        )
+        for regression in regressions:
+            print(
+                f"{regression['reference']:<40}{regression['profile']:<32}{regression['phase']:<11}"
+                f"{regression['baseline']:>9.0f}s{regression['duration']:>9.0f}s"
+                f"{regression['change']:>+8.0f}%"
+            )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from build_cost import (
+    get_ccache_hit_rate,
+    get_default_build_cost_path,
+    load_build_costs,
+)
+
+
+def get_ccache_builds(records, packages=None):
+    """The build steps with ccache counters, labelled by what changed since the
+    previous build of the same package.
+
+    Builds are grouped per ``(reference, package_id, profile)``. The first
+    build of a group is ``first``, a build of another recipe revision than the
+    previous one is ``new revision`` and a rebuild of the same revision is
+    ``same revision``. ``packages`` limits the builds to these package names.
+    """
+    previous = {}
+    builds = []
+    for record in sorted(records, key=lambda record: record["time"]):
+        if record["step"] != "build" or "ccache" not in record:
+            continue
+        name = record["reference"].split("/")[0]
+        if packages and name not in packages:
+            continue
+
+        key = (record["reference"], record["package_id"], record["profile"])
+        revision = record.get("revision")
+        if key not in previous:
+            kind = "first"
+        elif previous[key] != revision:
+            kind = "new revision"
+        else:
+            kind = "same revision"
+        previous[key] = revision
+
+        ccache = record["ccache"]
+        builds.append(
+            {
+                "name": name,
+                "reference": record["reference"],
+                "revision": revision,
+                "package_id": record["package_id"],
+                "profile": record["profile"],
+                "time": record["time"],
+                "success": record["success"],
+                "kind": kind,
+                "hits": ccache.get("direct_cache_hit", 0)
+                + ccache.get("preprocessed_cache_hit", 0),
+                "misses": ccache.get("cache_miss", 0),
+                "hit_rate": get_ccache_hit_rate(ccache),
+            }
+        )
+    return builds
+
+
+def get_revision_hit_rates(builds):
+    """Hit rate over all ``new revision`` builds per package name, ``None`` for
+    packages without such builds."""
+    counts = {}
+    for build in builds:
+        hits, misses = counts.setdefault(build["name"], (0, 0))
+        if build["kind"] == "new revision" and build["success"]:
+            hits += build["hits"]
+            misses += build["misses"]
+        counts[build["name"]] = (hits, misses)
+    return {
+        name: get_ccache_hit_rate({"direct_cache_hit": hits, "cache_miss": misses})
+        for name, (hits, misses) in counts.items()
+    }
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the ccache hit rate of package builds across recipe revisions"
+    )
+    parser.add_argument(
+        "packages",
+        nargs="*",
+        default=[],
+        help="Package names to report, e.g. poppler fontforge odrcore. Default: all",
+    )
+    parser.add_argument(
+        "--build-cost",
+        type=Path,
+        default=get_default_build_cost_path(),
+        help="Path to the records of the build cost hook",
+    )
+    parser.add_argument(
+        "--min-hit-rate",
+        type=float,
+        default=None,
+        help="Fail unless builds of a new recipe revision reach this hit rate for every package, e.g. 0.9",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the builds as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    builds = get_ccache_builds(load_build_costs(args.build_cost), args.packages)
+    hit_rates = get_revision_hit_rates(builds)
+
+    if args.json:
+        print(json.dumps({"builds": builds, "hit_rates": hit_rates}, indent=4))
+    else:
+        print(
+            f"{'reference':<32}{'revision':<10}{'profile':<32}{'kind':<16}{'hits':>8}{'misses':>8}{'rate':>7}"
+        )
+        for build in builds:
+            hit_rate = build["hit_rate"]
+            hit_rate = "-" if hit_rate is None else f"{hit_rate:.0%}"
+            status = "" if build["success"] else " (failed)"
+            print(
+                f"{build['reference'] + status:<32}{(build['revision'] or '-')[:8]:<10}"
+                f"{build['profile']:<32}{build['kind']:<16}"
+                f"{build['hits']:>8}{build['misses']:>8}{hit_rate:>7}"
+            )
+        print()
+
+    failed = False
+    for name in args.packages or sorted(hit_rates):
+        hit_rate = hit_rates.get(name)
+        if hit_rate is None:
+            message = "no build of a new recipe revision recorded"
+            failed = failed or args.min_hit_rate is not None
+        else:
+            message = f"{hit_rate:.0%} ccache hit rate after recipe changes"
+            if args.min_hit_rate is not None and hit_rate < args.min_hit_rate:
+                message += f", below {args.min_hit_rate:.0%}"
+                failed = True
+        if not args.json:
+            print(f"{name}: {message}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
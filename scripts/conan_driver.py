@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+
+class SubprocessConanDriver:
+    """Run every conan command in its own ``conan`` CLI process."""
+
+    name = "subprocess"
+
+    def run(self, command, cwd=None, stderr=subprocess.STDOUT):
+        return subprocess.run(
+            command,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            text=True,
+        )
+
+
+class ApiConanDriver:
+    """Run conan commands in-process through a single ``ConanAPI`` instance.
+
+    This avoids paying interpreter startup, Conan import and config loading for
+    every command. Only the commands and arguments the scripts use are
+    supported: ``export``, ``lock create``, ``lock merge`` and ``graph info``.
+    Anything else falls back to a subprocess.
+
+    ``ConanAPI`` is not thread safe and its output goes to the process wide
+    ``sys.stderr``, so commands are serialized.
+    """
+
+    name = "api"
+
+    _lock = threading.Lock()
+
+    def __init__(self, cache_folder=None):
+        from conan.api.conan_api import ConanAPI
+
+        self._conan_api = ConanAPI(cache_folder=cache_folder)
+        self._fallback = SubprocessConanDriver()
+        self._parsers = {
+            ("export",): self._get_export_parser(),
+            ("lock", "create"): self._get_graph_parser(),
+            ("lock", "merge"): self._get_lock_merge_parser(),
+            ("graph", "info"): self._get_graph_parser(),
+        }
+        self._handlers = {
+            ("export",): self._export,
+            ("lock", "create"): self._lock_create,
+            ("lock", "merge"): self._lock_merge,
+            ("graph", "info"): self._graph_info,
+        }
+
+    @staticmethod
+    def _get_export_parser():
+        parser = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+        parser.add_argument("path", nargs="?", default=".")
+        parser.add_argument("--version")
+        parser.add_argument("--format")
+        return parser
+
+    @staticmethod
+    def _get_graph_parser():
+        parser = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+        parser.add_argument("path", nargs="?", default=".")
+        parser.add_argument("--version")
+        parser.add_argument("--profile:build", "-pr:b", dest="profile_build")
+        parser.add_argument("--profile:host", "-pr:h", dest="profile_host")
+        parser.add_argument("--lockfile", "-l")
+        parser.add_argument("--lockfile-out")
+        parser.add_argument("--build", "-b", action="append")
+        parser.add_argument("--format")
+        return parser
+
+    @staticmethod
+    def _get_lock_merge_parser():
+        parser = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+        parser.add_argument("--lockfile", action="append", default=[])
+        parser.add_argument("--lockfile-out", default="conan.lock")
+        return parser
+
+    def _parse(self, command):
+        if not command or command[0] != "conan":
+            return None, None
+        for length in (2, 1):
+            key = tuple(command[1 : 1 + length])
+            if key in self._parsers:
+                try:
+                    args, unknown = self._parsers[key].parse_known_args(
+                        command[1 + length :]
+                    )
+                except argparse.ArgumentError:
+                    return None, None
+                if unknown:
+                    return None, None
+                return key, args
+        return None, None
+
+    def run(self, command, cwd=None, stderr=subprocess.STDOUT):
+        key, args = self._parse(command)
+        if key is None:
+            return self._fallback.run(command, cwd=cwd, stderr=stderr)
+
+        from conan.api.output import ConanOutput
+
+        cwd = str(Path(cwd).resolve()) if cwd is not None else os.getcwd()
+        log = io.StringIO()
+        returncode = 0
+        result = ""
+        with self._lock, contextlib.redirect_stderr(log):
+            try:
+                result = self._handlers[key](args, cwd)
+            except Exception as e:
+                ConanOutput().error(str(e))
+                returncode = 1
+
+        if stderr == subprocess.STDOUT:
+            return subprocess.CompletedProcess(
+                args=command,
+                returncode=returncode,
+                stdout=log.getvalue() + result,
+                stderr=None,
+            )
+        return subprocess.CompletedProcess(
+            args=command, returncode=returncode, stdout=result, stderr=log.getvalue()
+        )
+
+    def _get_profiles(self, args, cwd):
+        profiles = self._conan_api.profiles
+        profile_host = profiles.get_profile(
+            [args.profile_host or profiles.get_default_host()], cwd=cwd
+        )
+        profile_build = profiles.get_profile(
+            [args.profile_build or profiles.get_default_build()], cwd=cwd
+        )
+        return profile_host, profile_build
+
+    def _load_graph(self, args, cwd, lockfile_partial):
+        api = self._conan_api
+        path = api.local.get_conanfile_path(args.path, cwd, py=None)
+        remotes = api.remotes.list()
+        lockfile = api.lockfile.get_lockfile(
+            lockfile=args.lockfile,
+            conanfile_path=path,
+            cwd=cwd,
+            partial=lockfile_partial,
+        )
+        api.lockfile.check_lockfile_config(lockfile)
+        profile_host, profile_build = self._get_profiles(args, cwd)
+
+        graph = api.graph.load_graph_consumer(
+            path,
+            None,
+            args.version,
+            None,
+            None,
+            profile_host,
+            profile_build,
+            lockfile,
+            remotes,
+            None,
+        )
+        graph.report_graph_error()
+        api.graph.analyze_binaries(
+            graph, args.build, remotes=remotes, lockfile=lockfile
+        )
+        return graph, lockfile
+
+    def _export(self, args, cwd):
+        api = self._conan_api
+        path = api.local.get_conanfile_path(args.path, cwd, py=True)
+        ref, _ = api.export.export(
+            path=path,
+            name=None,
+            version=args.version,
+            user=None,
+            channel=None,
+            remotes=api.remotes.list(),
+        )
+        if args.format == "json":
+            return json.dumps({"reference": ref.repr_notime()})
+        return ""
+
+    def _lock_create(self, args, cwd):
+        api = self._conan_api
+        graph, lockfile = self._load_graph(args, cwd, lockfile_partial=True)
+        lockfile = api.lockfile.update_lockfile(lockfile, graph)
+        if args.lockfile_out is None:
+            lockfile_folder = os.path.dirname(graph.root.path)
+        else:
+            lockfile_folder = cwd
+        api.lockfile.save_lockfile(
+            lockfile, args.lockfile_out or "conan.lock", lockfile_folder
+        )
+        return ""
+
+    def _lock_merge(self, args, cwd):
+        from conan.api.output import ConanOutput
+
+        lockfiles = [os.path.join(cwd, lockfile) for lockfile in args.lockfile]
+        result = self._conan_api.lockfile.merge_lockfiles(lockfiles)
+        lockfile_out = os.path.join(cwd, args.lockfile_out)
+        result.save(lockfile_out)
+        ConanOutput().info(f"Generated lockfile: {lockfile_out}")
+        return ""
+
+    def _graph_info(self, args, cwd):
+        graph, _ = self._load_graph(args, cwd, lockfile_partial=False)
+        if args.format == "json":
+            return json.dumps({"graph": graph.serialize()}, indent=4)
+        return ""
+
+
+CONAN_DRIVERS = {
+    SubprocessConanDriver.name: SubprocessConanDriver,
+    ApiConanDriver.name: ApiConanDriver,
+}
+
+
+def get_conan_driver(name=SubprocessConanDriver.name):
+    return CONAN_DRIVERS[name]()
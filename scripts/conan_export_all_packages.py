@@ -1,43 +1,305 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import json
+import os
+import re
 import sys
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
-from definitions import get_root_path, get_recipes_path, get_default_selection_config
-from list_package_references import (
-    get_package_infos,
-    get_selected_packages,
+from build_journal import COMPLETED, FAILED, BuildJournal, get_default_journal_path
+from conan_driver import CONAN_DRIVERS, SubprocessConanDriver, get_conan_driver
+from definitions import (
+    get_root_path,
+    get_recipes_path,
+    get_default_selection_config,
+    get_conan_home_path,
+)
+from list_package_references import get_selected_packages
+from package_index import get_package_index, write_json_atomically
+from recipe_graph import (
+    get_default_graph_cache_path,
+    get_recipe_graph,
+    get_transitive_dependencies,
 )
 
 
-def export_package(package_info, root_path, dry_run=False):
-    conanfile_path = Path(package_info["directory"]) / package_info["conanfile"]
+def export_package(package_info, root_path, dry_run=False, log=print, driver=None):
+    conanfile_path = Path(package_info.directory) / package_info.conanfile
     command = [
         "conan",
         "export",
         str(conanfile_path),
         "--version",
-        package_info["version"],
+        package_info.version,
     ]
     if dry_run:
-        print("Dry run, not executing command: " + " ".join(command))
+        log("Dry run, not executing command: " + " ".join(command))
         proc = subprocess.CompletedProcess(
             args=command, returncode=0, stdout="Dry run", stderr=""
         )
     else:
-        print("Running command: " + " ".join(command))
-        proc = subprocess.run(
-            command,
-            cwd=root_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
+        log("Running command: " + " ".join(command))
+        if driver is None:
+            driver = SubprocessConanDriver()
+        proc = driver.run(command, cwd=root_path)
     return proc
 
 
+def get_default_export_manifest_path():
+    return get_conan_home_path() / "odr-export-manifest.json"
+
+
+def get_export_hash(package_info, root_path):
+    """Hash everything that goes into the exported recipe revision.
+
+    Covers conanfile.py, conandata.yml, the patches directory and the version
+    the recipe is exported with.
+    """
+    directory = Path(root_path) / package_info.directory
+    digest = hashlib.sha256()
+    digest.update(package_info.reference.encode())
+
+    paths = [directory / package_info.conanfile, directory / "conandata.yml"]
+    patches_path = directory / "patches"
+    if patches_path.is_dir():
+        paths += sorted(path for path in patches_path.rglob("*") if path.is_file())
+
+    for path in paths:
+        if not path.is_file():
+            continue
+        digest.update(path.relative_to(directory).as_posix().encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def load_export_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def get_cached_recipe_revisions(root_path):
+    """Return the set of ``name/version#revision`` in the local Conan cache."""
+    proc = subprocess.run(
+        ["conan", "list", "*#*", "--format=json"],
+        cwd=root_path,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return set()
+
+    revisions = set()
+    for reference, details in json.loads(proc.stdout).get("Local Cache", {}).items():
+        for revision in details.get("revisions", {}):
+            revisions.add(f"{reference}#{revision}")
+    return revisions
+
+
+def get_exported_revision(output):
+    match = re.search(r"Exported: \S+#([0-9a-f]+)", output)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def export_package_buffered(
+    package_info,
+    root_path,
+    dry_run=False,
+    manifest=None,
+    cached_revisions=None,
+    driver=None,
+):
+    """Export one package and collect everything it would print.
+
+    If ``manifest`` records the same export hash and that recipe revision is in
+    ``cached_revisions``, the export is skipped. Returns a tuple
+    ``(proc, lines, duration, export_hash)`` so the caller can print the output
+    of concurrent exports in order and without interleaving.
+    """
+    lines = [
+        f"Export package {package_info.package} version {package_info.version} ..."
+    ]
+    start = time.perf_counter()
+
+    export_hash = None
+    if manifest is not None:
+        export_hash = get_export_hash(package_info, root_path)
+        entry = manifest.get(package_info.reference, {})
+        cached_reference = f"{package_info.reference}#{entry.get("revision")}"
+        if entry.get("hash") == export_hash and cached_reference in cached_revisions:
+            lines.append(f"... up to date, skipping ({cached_reference})")
+            proc = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout="Up to date", stderr=""
+            )
+            return proc, lines, time.perf_counter() - start, None
+
+    proc = export_package(
+        package_info, root_path, dry_run=dry_run, log=lines.append, driver=driver
+    )
+    duration = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines.append("... failed to export")
+        lines.append(proc.stdout)
+    return proc, lines, duration, export_hash
+
+
+def get_locked_references(lockfile):
+    """All ``name/version`` references locked in ``lockfile``, if it exists."""
+    try:
+        with open(lockfile) as f:
+            lock = json.load(f)
+    except FileNotFoundError:
+        return set()
+
+    references = set()
+    for section in ["requires", "build_requires", "python_requires"]:
+        for entry in lock.get(section, []):
+            references.add(entry.split("#")[0])
+    return references
+
+
+def get_closure(package_index, references, root_path, graph):
+    """The references of this index needed to build ``references``.
+
+    These are ``references`` themselves, everything they transitively require
+    according to the recipe graph and every package of this index locked in
+    their ``conan.lock``, which also covers version ranges the graph cannot
+    resolve. Raises ``ValueError`` for references not in the index.
+    """
+    closure = set()
+    for reference in references:
+        package_info = package_index.get(reference)
+        if package_info is None:
+            raise ValueError(f"Unknown package reference {reference}")
+        lockfile = Path(root_path) / package_info.directory / "conan.lock"
+        closure.update(
+            locked
+            for locked in get_locked_references(lockfile)
+            if locked in package_index
+        )
+        closure.add(reference)
+    return get_transitive_dependencies(graph, closure)
+
+
+PYTHON_REQUIRE_PACKAGE_TYPE = re.compile(
+    r"^\s*package_type\s*=\s*[\"']python-require[\"']", re.MULTILINE
+)
+
+
+def is_python_require(package_info, root_path):
+    conanfile = Path(root_path) / package_info.directory / package_info.conanfile
+    return PYTHON_REQUIRE_PACKAGE_TYPE.search(conanfile.read_text()) is not None
+
+
+def get_export_batches(package_infos, root_path):
+    """Split ``package_infos`` into python-require recipes and all others.
+
+    Exporting a recipe loads its ``python_requires``, so they have to be in the
+    cache before the recipes using them are exported.
+    """
+    python_requires = []
+    others = []
+    for package_info in package_infos:
+        if is_python_require(package_info, root_path):
+            python_requires.append(package_info)
+        else:
+            others.append(package_info)
+    return [batch for batch in (python_requires, others) if batch]
+
+
+def export_packages(
+    package_infos,
+    root_path,
+    jobs=1,
+    dry_run=False,
+    manifest_path=None,
+    force=False,
+    driver=None,
+    journal=None,
+):
+    """Export packages on a pool of ``jobs`` workers.
+
+    python-require recipes are exported first, then output is printed in the
+    order of ``package_infos``. Unless ``force`` is set, packages whose inputs
+    are unchanged since the export recorded in ``manifest_path`` are skipped.
+    The outcome of every export is recorded in ``journal``. Returns the last
+    non-zero return code, or 0 if every export succeeded.
+    """
+    returncode = 0
+    serial_time = 0.0
+
+    manifest = None
+    cached_revisions = set()
+    if manifest_path is not None and not dry_run:
+        manifest = load_export_manifest(manifest_path)
+        # Without any cached revisions nothing is considered up to date
+        if not force:
+            cached_revisions = get_cached_recipe_revisions(root_path)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for batch in get_export_batches(package_infos, root_path):
+            results = executor.map(
+                lambda package_info: export_package_buffered(
+                    package_info,
+                    root_path,
+                    dry_run=dry_run,
+                    manifest=manifest,
+                    cached_revisions=cached_revisions,
+                    driver=driver,
+                ),
+                batch,
+            )
+            for package_info, (proc, lines, duration, export_hash) in zip(
+                batch, results
+            ):
+                for line in lines:
+                    print(line)
+                serial_time += duration
+                if journal is not None and not dry_run:
+                    journal.record(
+                        "export",
+                        package_info.reference,
+                        "",
+                        COMPLETED if proc.returncode == 0 else FAILED,
+                        duration,
+                    )
+                if proc.returncode != 0:
+                    returncode = proc.returncode
+                elif export_hash is not None:
+                    revision = get_exported_revision(proc.stdout)
+                    if revision is not None:
+                        manifest[package_info.reference] = {
+                            "hash": export_hash,
+                            "revision": revision,
+                        }
+    wall_time = time.perf_counter() - start
+
+    if manifest is not None:
+        write_json_atomically(manifest_path, manifest)
+
+    print(
+        f"Exported {len(package_infos)} packages with {jobs} jobs in {wall_time:.2f}s "
+        f"(serial {serial_time:.2f}s, saved {max(serial_time - wall_time, 0.0):.2f}s)"
+    )
+
+    return returncode
+
+
 def get_cli_args():
     parser = argparse.ArgumentParser(description="Export all packages")
     parser.add_argument(
@@ -58,6 +320,13 @@ def get_cli_args():
         default=None,
         help=f"Path to selection config file. Unused default: {get_default_selection_config()}",
     )
+    parser.add_argument(
+        "--closure-of",
+        nargs="+",
+        default=[],
+        metavar="REFERENCE",
+        help="Only export these package references and the recipes they transitively require",
+    )
     parser.add_argument(
         "--root-path",
         type=Path,
@@ -70,6 +339,36 @@ def get_cli_args():
         default=get_recipes_path(),
         help="Path to recipes directory",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of concurrent exports",
+    )
+    parser.add_argument(
+        "--export-manifest",
+        type=Path,
+        default=get_default_export_manifest_path(),
+        help="Path to the manifest of previous exports used to skip unchanged recipes",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Export all selected packages even if they are up to date",
+    )
+    parser.add_argument(
+        "--conan-driver",
+        choices=sorted(CONAN_DRIVERS),
+        default="subprocess",
+        help="Run conan commands in a subprocess each or in-process through the Conan API",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=get_default_journal_path(),
+        help="Path to the build journal recording exported packages",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -81,37 +380,66 @@ def get_cli_args():
 
 
 def main():
-    returncode = 0
-
     args = get_cli_args()
 
-    package_infos = get_package_infos(args.root_path, args.recipes_path)
-    package_references = [
-        package_info["package_reference"] for package_info in package_infos
-    ]
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    references = package_index.references()
+    if args.closure_of:
+        graph = get_recipe_graph(
+            package_index, args.root_path, get_default_graph_cache_path()
+        )
+        try:
+            references = get_closure(
+                package_index, args.closure_of, args.root_path, graph
+            )
+        except ValueError as e:
+            print(e)
+            return 1
+        print(
+            f"Closure of {', '.join(args.closure_of)}: {len(references)} of "
+            f"{len(package_index)} package versions"
+        )
     selected_packages = get_selected_packages(
-        package_references,
+        references,
         args.selection_config,
         args.include_packages,
         args.exclude_packages,
     )
+    selected_package_infos = package_index.select(selected_packages)
 
-    for package_info in package_infos:
-        if package_info["package_reference"] not in selected_packages:
-            continue
+    jobs = args.jobs
+    if args.conan_driver == "api" and jobs > 1:
+        print("The Conan API driver runs one command at a time, using 1 job")
+        jobs = 1
 
-        print(
-            f"Export package {package_info["package"]} version {package_info["version"]} ..."
+    # A dry run exports nothing, so it neither opens nor updates the journal
+    with nullcontext() if args.dry_run else BuildJournal(args.journal) as journal:
+        # Unchanged recipes are skipped through the export manifest, which
+        # also checks that the revision is still in the Conan cache
+        if journal is not None:
+            journal.start(
+                "export",
+                [
+                    (
+                        package_info.reference,
+                        "",
+                        get_export_hash(package_info, args.root_path),
+                        "",
+                    )
+                    for package_info in selected_package_infos
+                ],
+            )
+        return export_packages(
+            selected_package_infos,
+            args.root_path,
+            jobs=jobs,
+            dry_run=args.dry_run,
+            manifest_path=args.export_manifest,
+            force=args.force,
+            driver=get_conan_driver(args.conan_driver),
+            journal=journal,
         )
 
-        proc = export_package(package_info, args.root_path, dry_run=args.dry_run)
-        if proc.returncode != 0:
-            print("... failed to export")
-            print(proc.stdout)
-            returncode = proc.returncode
-
-    return returncode
-
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,47 +1,366 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
+import os
 import sys
 import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from definitions import get_recipes_path, get_root_path, get_default_selection_config
-from list_package_references import (
-    get_package_infos,
-    get_selected_packages,
+from build_journal import (
+    COMPLETED,
+    FAILED,
+    BuildJournal,
+    get_default_journal_path,
+    get_file_hash,
 )
+from build_platforms import get_platform_configs
+from conan_driver import CONAN_DRIVERS, SubprocessConanDriver, get_conan_driver
+from conan_export_all_packages import get_export_hash
+from definitions import (
+    get_recipes_path,
+    get_root_path,
+    get_default_selection_config,
+    get_profiles_path,
+)
+from list_package_references import get_selected_packages
+from package_index import get_package_index
+
+DEFAULT_PROFILE_PAIRS = [
+    ("ubuntu-24.04-x86_64-clang-18", "android-21-armv8"),
+    ("ubuntu-24.04-x86_64-clang-18", "ubuntu-24.04-x86_64-clang-18"),
+    ("macos-15-armv8-apple-clang-14", "macos-15-armv8-apple-clang-14"),
+    ("windows-2022-x86_64-msvc-1940", "windows-2022-x86_64-msvc-1940"),
+]
+
+
+def get_profile_pairs(profiles_path, all_profiles=False):
+    """Return the (build_profile, host_profile) pairs to lock for.
+
+    With ``all_profiles`` every profile in ``profiles_path`` is used as host
+    profile, built from the profile its platform config names.
+    """
+    if not all_profiles:
+        return list(DEFAULT_PROFILE_PAIRS)
+
+    return [
+        (config["build_profile"], config["host_profile"])
+        for _, config in get_platform_configs(profiles_path)
+    ]
 
 
-def create_lock_file(package_info, build_profile, host_profile, dry_run=False):
-    conanfile_path = Path(package_info["directory"]) / package_info["conanfile"]
+def create_lock_file(
+    package_info,
+    build_profile,
+    host_profile,
+    lockfile=None,
+    lockfile_out=None,
+    dry_run=False,
+    log=print,
+    driver=None,
+):
+    conanfile_path = Path(package_info.directory) / package_info.conanfile
     command = [
         "conan",
         "lock",
         "create",
         str(conanfile_path),
         "--version",
-        package_info["version"],
+        package_info.version,
         "--profile:build",
         str(build_profile),
         "--profile:host",
         str(host_profile),
     ]
+    if lockfile is not None:
+        command += ["--lockfile", str(lockfile)]
+    if lockfile_out is not None:
+        command += ["--lockfile-out", str(lockfile_out)]
     if dry_run:
-        print("Dry run, not executing command: " + " ".join(command))
+        log("Dry run, not executing command: " + " ".join(command))
         proc = subprocess.CompletedProcess(
             args=command, returncode=0, stdout="Dry run", stderr=""
         )
     else:
-        print("Running command: " + " ".join(command))
-        proc = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
+        log("Running command: " + " ".join(command))
+        if driver is None:
+            driver = SubprocessConanDriver()
+        proc = driver.run(command)
+    return proc
+
+
+def lock_package_buffered(
+    package_info,
+    build_profile,
+    host_profile,
+    lockfile_locks,
+    dry_run=False,
+    driver=None,
+):
+    """Lock one package for one profile pair and collect everything it would print.
+
+    ``conan lock create`` extends the ``conan.lock`` next to the conanfile, which
+    is shared by all profiles and by all versions using the same folder. Runs
+    writing the same lockfile are serialized through ``lockfile_locks``.
+    """
+    lines = [
+        f"Lock package {package_info.package} version {package_info.version} for {host_profile.name} ..."
+    ]
+    with lockfile_locks[package_info.directory]:
+        start = time.perf_counter()
+        proc = create_lock_file(
+            package_info,
+            build_profile=build_profile,
+            host_profile=host_profile,
+            dry_run=dry_run,
+            log=lines.append,
+            driver=driver,
+        )
+        duration = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines.append("... failed to lock")
+        lines.append(proc.stdout)
+    return proc, lines, duration
+
+
+def lock_packages(
+    package_infos, profile_pairs, profiles_path, jobs=1, dry_run=False, driver=None
+):
+    """Lock every package for every profile pair on a pool of ``jobs`` workers.
+
+    Output is printed in order. Returns the last non-zero return code, or 0 if
+    every lock succeeded.
+    """
+    returncode = 0
+    serial_time = 0.0
+    lockfile_locks = defaultdict(threading.Lock)
+
+    tasks = [
+        (package_info, build_profile, host_profile)
+        for package_info in package_infos
+        for build_profile, host_profile in profile_pairs
+    ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = executor.map(
+            lambda task: lock_package_buffered(
+                task[0],
+                build_profile=Path(profiles_path) / task[1],
+                host_profile=Path(profiles_path) / task[2],
+                lockfile_locks=lockfile_locks,
+                dry_run=dry_run,
+                driver=driver,
+            ),
+            tasks,
+        )
+        for proc, lines, duration in results:
+            for line in lines:
+                print(line)
+            serial_time += duration
+            if proc.returncode != 0:
+                returncode = proc.returncode
+    wall_time = time.perf_counter() - start
+
+    print(
+        f"Locked {len(package_infos)} packages for {len(profile_pairs)} profiles with {jobs} jobs in {wall_time:.2f}s "
+        f"(serial {serial_time:.2f}s, saved {max(serial_time - wall_time, 0.0):.2f}s)"
+    )
+
+    return returncode
+
+
+def merge_lock_files(lockfiles, lockfile_out, dry_run=False, log=print, driver=None):
+    command = ["conan", "lock", "merge"]
+    for lockfile in lockfiles:
+        command += ["--lockfile", str(lockfile)]
+    command += ["--lockfile-out", str(lockfile_out)]
+    if dry_run:
+        log("Dry run, not executing command: " + " ".join(command))
+        proc = subprocess.CompletedProcess(
+            args=command, returncode=0, stdout="Dry run", stderr=""
         )
+    else:
+        log("Running command: " + " ".join(command))
+        if driver is None:
+            driver = SubprocessConanDriver()
+        proc = driver.run(command)
     return proc
 
 
+def get_lock_file_revisions(lockfile):
+    """Map each ``name/version`` in ``lockfile`` to its set of locked revisions."""
+    with open(lockfile) as f:
+        lock = json.load(f)
+
+    revisions = defaultdict(set)
+    for section in ["requires", "build_requires", "python_requires"]:
+        for entry in lock.get(section, []):
+            reference, _, revision = entry.partition("#")
+            revisions[reference].add(revision.split("%")[0])
+    return revisions
+
+
+def resolve_lock_file_buffered(
+    package_info, build_profile, host_profile, lockfile_out, dry_run=False, driver=None
+):
+    """Resolve one package for one profile pair into its own lockfile.
+
+    The existing ``conan.lock`` is ignored so every profile is resolved from
+    scratch and independently of the others.
+    """
+    lines = [
+        f"Resolve package {package_info.package} version {package_info.version} for {host_profile.name} ..."
+    ]
+    start = time.perf_counter()
+    proc = create_lock_file(
+        package_info,
+        build_profile=build_profile,
+        host_profile=host_profile,
+        lockfile="",
+        lockfile_out=lockfile_out,
+        dry_run=dry_run,
+        log=lines.append,
+        driver=driver,
+    )
+    duration = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines.append("... failed to resolve")
+        lines.append(proc.stdout)
+    return proc, lines, duration
+
+
+def lock_packages_merged(
+    package_infos,
+    profile_pairs,
+    profiles_path,
+    root_path,
+    jobs=1,
+    dry_run=False,
+    driver=None,
+    journal=None,
+    journal_profile="",
+    replace=False,
+):
+    """Lock packages by merging independently resolved per-profile lockfiles.
+
+    All package/profile pairs are resolved concurrently into temporary
+    lockfiles, which are then merged into the ``conan.lock`` of each package
+    directory below ``root_path``. The existing ``conan.lock`` is a merge
+    input too, so entries needed by versions or profiles that were not
+    resolved are kept, unless ``replace`` is set. A directory whose resolution failed for any version
+    or profile keeps its previous lockfile. The outcome for every package is
+    recorded in ``journal`` under ``journal_profile``. Returns the last
+    non-zero return code, or 0 if every package was locked.
+    """
+    returncode = 0
+    serial_time = 0.0
+    package_durations = defaultdict(float)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="conan-lock-") as tmp_path:
+        tasks = []
+        for package_info in package_infos:
+            for build_profile, host_profile in profile_pairs:
+                lockfile_out = (
+                    Path(tmp_path)
+                    / package_info.directory
+                    / f"{package_info.version}-{host_profile}.lock"
+                )
+                tasks.append((package_info, build_profile, host_profile, lockfile_out))
+
+        # directory -> resolved lockfiles, or None if any resolution failed
+        directory_lockfiles = {}
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            results = executor.map(
+                lambda task: resolve_lock_file_buffered(
+                    task[0],
+                    build_profile=Path(profiles_path) / task[1],
+                    host_profile=Path(profiles_path) / task[2],
+                    lockfile_out=task[3],
+                    dry_run=dry_run,
+                    driver=driver,
+                ),
+                tasks,
+            )
+            for task, (proc, lines, duration) in zip(tasks, results):
+                for line in lines:
+                    print(line)
+                serial_time += duration
+                package_durations[task[0].reference] += duration
+
+                directory = task[0].directory
+                lockfiles = directory_lockfiles.setdefault(directory, [])
+                if proc.returncode != 0:
+                    returncode = proc.returncode
+                    directory_lockfiles[directory] = None
+                elif lockfiles is not None:
+                    lockfiles.append(task[3])
+
+        def record(directory, status):
+            if journal is None or dry_run:
+                return
+            lock_hash = get_file_hash(Path(root_path) / directory / "conan.lock")
+            for package_info in package_infos:
+                if package_info.directory == directory:
+                    journal.record(
+                        "lock",
+                        package_info.reference,
+                        journal_profile,
+                        status,
+                        package_durations[package_info.reference],
+                        lock_hash=lock_hash,
+                    )
+
+        for directory, lockfiles in directory_lockfiles.items():
+            lockfile_out = Path(root_path) / directory / "conan.lock"
+            if lockfiles is None:
+                print(f"Skip merging {lockfile_out} because resolution failed")
+                record(directory, FAILED)
+                continue
+            if not replace and lockfile_out.is_file():
+                lockfiles = [lockfile_out, *lockfiles]
+
+            print(f"Merge {len(lockfiles)} lockfiles into {lockfile_out} ...")
+            proc = merge_lock_files(
+                lockfiles, lockfile_out, dry_run=dry_run, driver=driver
+            )
+            if proc.returncode != 0:
+                print("... failed to merge")
+                print(proc.stdout)
+                returncode = proc.returncode
+                record(directory, FAILED)
+                continue
+            record(directory, COMPLETED)
+            if dry_run:
+                continue
+
+            revisions = get_lock_file_revisions(lockfile_out)
+            multiple_revisions = {
+                reference: len(reference_revisions)
+                for reference, reference_revisions in revisions.items()
+                if len(reference_revisions) > 1
+            }
+            print(
+                f"... {len(revisions)} references, {len(multiple_revisions)} with multiple revisions"
+            )
+            for reference, count in sorted(multiple_revisions.items()):
+                print(f"    {reference}: {count} revisions")
+    wall_time = time.perf_counter() - start
+
+    print(
+        f"Locked {len(directory_lockfiles)} package directories for {len(profile_pairs)} profiles with {jobs} jobs in {wall_time:.2f}s "
+        f"(serial {serial_time:.2f}s, saved {max(serial_time - wall_time, 0.0):.2f}s)"
+    )
+
+    return returncode
+
+
 def get_cli_args():
     parser = argparse.ArgumentParser(
         description="Lock all packages for specified profiles"
@@ -76,6 +395,53 @@ def get_cli_args():
         default=get_recipes_path(),
         help="Path to recipes directory",
     )
+    parser.add_argument(
+        "--profiles-path",
+        type=Path,
+        default=get_profiles_path(),
+        help="Path to Conan profiles directory",
+    )
+    parser.add_argument(
+        "--all-profiles",
+        action="store_true",
+        help="With --incremental, lock for every profile in the profiles directory instead of the default set. "
+        "The merged lockfiles always cover every profile",
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Replace conan.lock with the merged resolutions instead of merging them into it, "
+        "dropping entries no version of the directory needs any more",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Extend the existing conan.lock profile by profile instead of merging independently resolved lockfiles",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of concurrent lock resolutions",
+    )
+    parser.add_argument(
+        "--conan-driver",
+        choices=sorted(CONAN_DRIVERS),
+        default="subprocess",
+        help="Run conan commands in a subprocess each or in-process through the Conan API",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=get_default_journal_path(),
+        help="Path to the build journal recording locked packages",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip package directories the journal records as locked for the same recipes and lockfile",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -87,49 +453,92 @@ def get_cli_args():
 
 
 def main():
-    returncode = 0
-
     args = get_cli_args()
 
-    package_infos = get_package_infos(args.root_path, args.recipes_path)
-    package_references = [
-        package_info["package_reference"] for package_info in package_infos
-    ]
+    package_index = get_package_index(args.root_path, args.recipes_path)
     selected_packages = get_selected_packages(
-        package_references,
+        package_index.references(),
         args.selection_config,
         args.include_packages,
         args.exclude_packages,
     )
+    selected_package_infos = package_index.select(selected_packages)
 
-    for package_info in package_infos:
-        if package_info["package_reference"] not in selected_packages:
-            continue
+    jobs = args.jobs
+    if args.conan_driver == "api" and jobs > 1:
+        print("The Conan API driver runs one command at a time, using 1 job")
+        jobs = 1
 
-        for build_profile, host_profile in [
-            ("ubuntu-24.04-x86_64-clang-18", "android-21-armv8"),
-            ("ubuntu-24.04-x86_64-clang-18", "ubuntu-24.04-x86_64-clang-18"),
-            ("macos-15-armv8-apple-clang-14", "macos-15-armv8-apple-clang-14"),
-            ("windows-2022-x86_64-msvc-1940", "windows-2022-x86_64-msvc-1940"),
-        ]:
-            print(
-                f"Lock package {package_info["package"]} version {package_info["version"]} for {host_profile} ..."
-            )
+    driver = get_conan_driver(args.conan_driver)
 
-            proc = create_lock_file(
-                package_info,
-                build_profile=args.root_path
-                / f".github/config/conan/profiles/{build_profile}",
-                host_profile=args.root_path
-                / f".github/config/conan/profiles/{host_profile}",
-                dry_run=args.dry_run,
-            )
-            if proc.returncode != 0:
-                print("... failed to lock")
-                print(proc.stdout)
-            returncode = proc.returncode
+    if args.incremental:
+        return lock_packages(
+            selected_package_infos,
+            get_profile_pairs(args.profiles_path, args.all_profiles),
+            args.profiles_path,
+            jobs=jobs,
+            dry_run=args.dry_run,
+            driver=driver,
+        )
 
-    return returncode
+    # The merged lockfile is shared by every version of a folder and every
+    # profile, so all of them are resolved, not only the selected ones
+    profile_pairs = get_profile_pairs(args.profiles_path, all_profiles=True)
+    selected_directories = {
+        package_info.directory for package_info in selected_package_infos
+    }
+    selected_package_infos = [
+        package_info
+        for package_info in package_index
+        if package_info.directory in selected_directories
+    ]
+
+    journal_profile = "all"
+    with BuildJournal(args.journal) as journal:
+        completed = journal.start(
+            "lock",
+            [
+                (
+                    package_info.reference,
+                    journal_profile,
+                    get_export_hash(package_info, args.root_path),
+                    get_file_hash(
+                        Path(args.root_path) / package_info.directory / "conan.lock"
+                    ),
+                )
+                for package_info in selected_package_infos
+            ],
+            resume=args.resume,
+        )
+
+        # A lockfile is merged from all versions using its directory
+        incomplete_directories = {
+            package_info.directory
+            for package_info in selected_package_infos
+            if (package_info.reference, journal_profile) not in completed
+        }
+        for directory in sorted(
+            {package_info.directory for package_info in selected_package_infos}
+            - incomplete_directories
+        ):
+            print(f"Skip {directory}, already locked")
+
+        return lock_packages_merged(
+            [
+                package_info
+                for package_info in selected_package_infos
+                if package_info.directory in incomplete_directories
+            ],
+            profile_pairs,
+            args.profiles_path,
+            args.root_path,
+            jobs=jobs,
+            dry_run=args.dry_run,
+            driver=driver,
+            journal=journal,
+            journal_profile=journal_profile,
+            replace=args.replace,
+        )
 
 
 if __name__ == "__main__":
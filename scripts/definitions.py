@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 
@@ -13,5 +14,20 @@ def get_recipes_path() -> Path:
     return get_root_path() / "recipes"
 
 
+def get_cache_path() -> Path:
+    return get_root_path() / ".cache"
+
+
+def get_profiles_path() -> Path:
+    return get_root_path() / ".github" / "config" / "conan" / "profiles"
+
+
 def get_default_selection_config():
     return get_root_path() / "defaults.yaml"
+
+
+def get_conan_home_path() -> Path:
+    conan_home = os.environ.get("CONAN_HOME")
+    if conan_home:
+        return Path(conan_home)
+    return Path.home() / ".conan2"
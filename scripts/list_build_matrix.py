@@ -5,12 +5,43 @@ import json
 import os
 import sys
 from pathlib import Path
-import fnmatch
 
-import yaml
+from build_platforms import get_platform_configs
+from definitions import (
+    get_recipes_path,
+    get_root_path,
+    get_default_selection_config,
+    get_profiles_path,
+    get_cache_path,
+)
+from selection import get_selection_config
 
-from definitions import get_recipes_path, get_root_path, get_default_selection_config
-from list_package_references import item_to_list
+
+def get_build_matrices(
+    package_references,
+    selection_config_path=None,
+    include_platforms=[],
+    exclude_platforms=[],
+    profiles_path=get_profiles_path(),
+):
+    """The build configs of every package reference in one pass.
+
+    Returns a dict mapping each package reference to its list of configs. The
+    selection config and the profiles are read once for all packages.
+    """
+    selector = get_selection_config(selection_config_path).get_build_matrix_selector(
+        include_platforms, exclude_platforms
+    )
+    platform_configs = get_platform_configs(profiles_path)
+
+    return {
+        package_reference: [
+            config
+            for platform, config in platform_configs
+            if selector(package_reference, platform, config["host_profile"])
+        ]
+        for package_reference in package_references
+    }
 
 
 def get_build_matrix(
@@ -18,157 +49,48 @@ def get_build_matrix(
     selection_config_path=None,
     include_platforms=[],
     exclude_platforms=[],
+    profiles_path=get_profiles_path(),
 ):
-    include_platforms = list(include_platforms)
-    exclude_platforms = list(exclude_platforms)
-    include_profiles = []
-    exclude_profiles = []
-    rules = []
-
-    if selection_config_path is not None:
-        with open(selection_config_path) as f:
-            selection_config = yaml.safe_load(f)
-
-        if not include_platforms and not exclude_platforms:
-            include_platforms = item_to_list(
-                selection_config["platforms"].get("include", [])
-            )
-            exclude_platforms = item_to_list(
-                selection_config["platforms"].get("exclude", [])
-            )
+    return get_build_matrices(
+        [package_reference],
+        selection_config_path,
+        include_platforms,
+        exclude_platforms,
+        profiles_path,
+    )[package_reference]
 
-        if not include_profiles and not exclude_profiles:
-            include_profiles = item_to_list(
-                selection_config["profiles"].get("include", [])
-            )
-            exclude_profiles = item_to_list(
-                selection_config["profiles"].get("exclude", [])
-            )
 
-        if not rules:
-            rules = selection_config["rules"]
-
-    if not include_platforms:
-        include_platforms = ["*"]
-    if not include_profiles:
-        include_profiles = ["*"]
-
-    build_matrix = []
-
-    def check_and_append(platform, config):
-        if all(not fnmatch.fnmatch(platform, pattern) for pattern in include_platforms):
-            return
-        if any(fnmatch.fnmatch(platform, pattern) for pattern in exclude_platforms):
-            return
-
-        profile = config["host_profile"]
-        if all(not fnmatch.fnmatch(profile, pattern) for pattern in include_profiles):
-            return
-        if any(fnmatch.fnmatch(profile, pattern) for pattern in exclude_profiles):
-            return
-
-        rule_excluded = False
-        for rule in rules:
-            if all(
-                not fnmatch.fnmatch(package_reference, pattern)
-                for pattern in item_to_list(rule.get("packages", "*"))
-            ):
-                continue
-            if all(
-                not fnmatch.fnmatch(platform, pattern)
-                for pattern in item_to_list(rule.get("platforms", "*"))
-            ):
-                continue
-            if all(
-                not fnmatch.fnmatch(profile, pattern)
-                for pattern in item_to_list(rule.get("profiles", "*"))
-            ):
-                continue
-
-            if rule["type"] == "include":
-                rule_excluded = False
-            elif rule["type"] == "exclude":
-                rule_excluded = True
-        if rule_excluded:
-            return
-
-        build_matrix.append(config)
-
-    # android
-    for platform in [
-        # using 35 because of the 16k page size requirement
-        "android-35-armv8",
-        "android-35-armv7",
-        "android-35-x86",
-        "android-35-x86_64",
-        # TODO why do we use 23?
-        "android-23-armv8",
-        "android-23-armv7",
-        "android-23-x86",
-        "android-23-x86_64",
-        # TODO why do we use 21?
-        "android-21-armv8",
-        "android-21-armv7",
-        "android-21-x86",
-        "android-21-x86_64",
-    ]:
-        check_and_append(
-            platform,
-            {
-                "build_machine": "ubuntu-24.04",
-                "build_profile": "ubuntu-24.04-x86_64-clang-18",
-                "host_profile": platform,
-                "ndk_version": "28.1.13356709",
-            },
-        )
-
-    # macos
-    check_and_append(
-        "macos-15",
-        {
-            "build_machine": "macos-15",
-            "build_profile": "macos-15-armv8-apple-clang-14",
-            "host_profile": "macos-15-armv8-apple-clang-14",
-        },
-    )
-    check_and_append(
-        "macos-26",
-        {
-            "build_machine": "macos-26",
-            "build_profile": "macos-26-armv8-apple-clang-14",
-            "host_profile": "macos-26-armv8-apple-clang-14",
-        },
+def explain_build_matrices(
+    package_references,
+    selection_config_path=None,
+    include_platforms=[],
+    exclude_platforms=[],
+    profiles_path=get_profiles_path(),
+):
+    """Print which part of the selection decided every package/platform/profile."""
+    selector = get_selection_config(selection_config_path).get_build_matrix_selector(
+        include_platforms, exclude_platforms
     )
+    platform_configs = get_platform_configs(profiles_path)
 
-    # ubuntu
-    check_and_append(
-        "ubuntu-24.04",
-        {
-            "build_machine": "ubuntu-24.04",
-            "build_profile": "ubuntu-24.04-x86_64-gcc-14",
-            "host_profile": "ubuntu-24.04-x86_64-gcc-14",
-        },
-    )
-    check_and_append(
-        "ubuntu-24.04",
-        {
-            "build_machine": "ubuntu-24.04",
-            "build_profile": "ubuntu-24.04-x86_64-clang-18",
-            "host_profile": "ubuntu-24.04-x86_64-clang-18",
-        },
-    )
+    for package_reference in package_references:
+        for platform, config in platform_configs:
+            selected, reason = selector.explain(
+                package_reference, platform, config["host_profile"]
+            )
+            decision = "include" if selected else "exclude"
+            print(
+                f"{package_reference} {platform} {config['host_profile']}: "
+                f"{decision} by {reason}"
+            )
 
-    # windows
-    check_and_append(
-        "windows-2022",
-        {
-            "build_machine": "windows-2022",
-            "build_profile": "windows-2022-x86_64-msvc-1940",
-            "host_profile": "windows-2022-x86_64-msvc-1940",
-        },
-    )
 
-    return build_matrix
+def load_package_infos(packages_json):
+    """Read package infos as written to the ``packages`` output, ``-`` is stdin."""
+    if str(packages_json) == "-":
+        return json.load(sys.stdin)
+    with open(packages_json) as f:
+        return json.load(f)
 
 
 def get_cli_args():
@@ -176,13 +98,20 @@ def get_cli_args():
     parser.add_argument(
         "directory",
         type=Path,
+        nargs="?",
         help="Path to package directory containing conanfile.py",
     )
     parser.add_argument(
         "version",
         type=str,
+        nargs="?",
         help="Version of the package",
     )
+    parser.add_argument(
+        "--packages-json",
+        type=Path,
+        help="List the matrix of all packages in this JSON file instead, as written to the packages output of list_package_references.py. Use - for stdin",
+    )
     parser.add_argument(
         "--include-platforms",
         nargs="*",
@@ -201,6 +130,17 @@ def get_cli_args():
         default=None,
         help=f"Path to selection config file. Unused default: {get_default_selection_config()}",
     )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print which pattern or rule decided each package, platform and profile instead of the matrix",
+    )
+    parser.add_argument(
+        "--profiles-path",
+        type=Path,
+        default=get_profiles_path(),
+        help="Path to the conan profiles the platforms are discovered from",
+    )
     parser.add_argument(
         "--root-path",
         type=Path,
@@ -220,6 +160,9 @@ def get_cli_args():
     )
     args = parser.parse_args()
 
+    if args.packages_json is None and (args.directory is None or args.version is None):
+        parser.error("either directory and version or --packages-json is required")
+
     return args
 
 
@@ -231,8 +174,17 @@ def get_github_args():
     github = json.loads(os.environ.get("GITHUB_CONTEXT", "{}"))
     inputs = json.loads(os.environ.get("GITHUB_INPUT", "{}"))
 
-    directory = Path(inputs.get("directory"))
-    version = inputs.get("package_version")
+    packages_json = None
+    directory = None
+    version = None
+    if inputs.get("packages"):
+        packages_json = get_cache_path() / "build-matrix-packages.json"
+        packages_json.parent.mkdir(parents=True, exist_ok=True)
+        with open(packages_json, "w") as f:
+            f.write(inputs["packages"])
+    else:
+        directory = Path(inputs.get("directory"))
+        version = inputs.get("package_version")
 
     include_platforms = (
         inputs.get("platform_include_patterns").split(",")
@@ -250,9 +202,12 @@ def get_github_args():
     return argparse.Namespace(
         directory=directory,
         version=version,
+        packages_json=packages_json,
         include_platforms=include_platforms,
         exclude_platforms=exclude_platforms,
         selection_config=selection_config,
+        profiles_path=get_profiles_path(),
+        explain=False,
         root_path=root_path,
         recipes_path=recipes_path,
         github_output=github_output,
@@ -271,15 +226,54 @@ def main():
     else:
         args = get_cli_args()
 
-    # TODO that does not look great
-    package_name = args.directory.parent.name
-    package_reference = f"{package_name}/{args.version}"
+    if args.packages_json is not None:
+        package_infos = load_package_infos(args.packages_json)
+        package_references = [
+            package_info["package_reference"] for package_info in package_infos
+        ]
+    else:
+        # TODO that does not look great
+        package_name = args.directory.parent.name
+        package_references = [f"{package_name}/{args.version}"]
+
+    if args.explain:
+        explain_build_matrices(
+            package_references,
+            args.selection_config,
+            args.include_platforms,
+            args.exclude_platforms,
+            args.profiles_path,
+        )
+        return 0
+
+    if args.packages_json is not None:
+        build_matrices = get_build_matrices(
+            package_references,
+            args.selection_config,
+            args.include_platforms,
+            args.exclude_platforms,
+            args.profiles_path,
+        )
+        build_matrix = [
+            {"package": package_info, "config": config}
+            for package_info in package_infos
+            for config in build_matrices[package_info["package_reference"]]
+        ]
+
+        print(json.dumps(build_matrix, indent=4))
+
+        if is_github:
+            with open(args.github_output, "w") as out:
+                print(f"matrix={json.dumps(build_matrix)}", file=out)
+
+        return 0
 
     build_matrix = get_build_matrix(
-        package_reference,
+        package_references[0],
         args.selection_config,
         args.include_platforms,
         args.exclude_platforms,
+        args.profiles_path,
     )
 
     print(json.dumps(build_matrix, indent=4))
@@ -6,117 +6,130 @@ import os
 import subprocess
 import sys
 from pathlib import Path
-import fnmatch
 
-import yaml
-
-from definitions import get_recipes_path, get_root_path, get_default_selection_config
-
-
-def item_to_list(item_or_list):
-    if isinstance(item_or_list, list):
-        return item_or_list
-    return [item_or_list]
-
-
-def get_package_infos(root_path, recipes_path):
-    package_infos = []
-
-    for package_path in recipes_path.iterdir():
-        if not package_path.is_dir():
-            continue
-
-        config_file = package_path / "config.yml"
-        if not config_file.is_file():
-            continue
-
-        with open(config_file) as f:
-            config = yaml.safe_load(f)
-
-        package_name = package_path.name
-        for version, details in config["versions"].items():
-            package_directory = (package_path / str(details["folder"])).relative_to(
-                root_path
-            )
-
-            package_infos.append(
-                {
-                    "package": package_name,
-                    "version": version,
-                    "package_reference": "{}/{}".format(package_name, version),
-                    "directory": str(package_directory),
-                    "conanfile": "conanfile.py",
-                    "test_conanfile": "test_package/conanfile.py",
-                }
-            )
-
-    package_infos = sorted(package_infos, key=lambda x: x["version"])
-    package_infos = sorted(package_infos, key=lambda x: x["package"])
-
-    return package_infos
+from definitions import (
+    get_recipes_path,
+    get_root_path,
+    get_default_selection_config,
+)
+from package_index import get_package_index
+from recipe_graph import (
+    get_default_graph_cache_path,
+    get_recipe_graph,
+    get_transitive_dependents,
+)
+from selection import get_selection_config
 
 
 def get_selected_packages(
     package_references, config, include_packages, exclude_packages
 ):
-    include_packages = list(include_packages)
-    exclude_packages = list(exclude_packages)
+    selector = get_selection_config(config).get_package_selector(
+        include_packages, exclude_packages
+    )
 
-    if config is not None:
-        with open(config) as f:
-            selection = yaml.safe_load(f)
-        package_selection = selection["packages"]
+    return [
+        package_reference
+        for package_reference in package_references
+        if selector(package_reference)
+    ]
 
-        if not include_packages and not exclude_packages:
-            include_packages = item_to_list(package_selection.get("include", []))
-            exclude_packages = item_to_list(package_selection.get("exclude", []))
 
-    if not include_packages:
-        include_packages = ["*"]
+NULL_COMMIT_ID = "0" * 40
 
-    result = []
 
-    for package_reference in package_references:
-        if all(
-            not fnmatch.fnmatch(package_reference, pattern)
-            for pattern in include_packages
-        ):
-            continue
-        if any(
-            fnmatch.fnmatch(package_reference, pattern) for pattern in exclude_packages
-        ):
-            continue
-        result.append(package_reference)
+def get_files_in_commits(root_path, commit_id_list):
+    """Files touched by any of the given commits, with a single ``git log`` call.
+
+    Returns ``None`` if git cannot read the commits, e.g. because one of them
+    is not available.
+    """
+    files_in_commits = subprocess.run(
+        ["git", "log", "--no-walk=unsorted", "--name-only", "--format="]
+        + list(commit_id_list),
+        capture_output=True,
+        text=True,
+        cwd=root_path,
+    )
+    if files_in_commits.returncode != 0:
+        return None
+    return set(filter(None, files_in_commits.stdout.split("\n")))
 
-    return result
 
+def get_files_in_range(root_path, base_commit_id, head_commit_id):
+    """Files changed between the merge base of both commits and ``head_commit_id``.
 
-def get_files_in_commit(root_path, commit_id):
-    files_in_commit = subprocess.run(
-        ["git", "diff-tree", "--no-commit-id", "--name-only", "-r", commit_id],
+    Returns ``None`` if git cannot compute the diff, e.g. because the base
+    commit is not available.
+    """
+    files_in_range = subprocess.run(
+        ["git", "diff", "--name-only", f"{base_commit_id}...{head_commit_id}"],
         capture_output=True,
         text=True,
         cwd=root_path,
     )
-    return filter(None, files_in_commit.stdout.split("\n"))
-
+    if files_in_range.returncode != 0:
+        return None
+    return set(filter(None, files_in_range.stdout.split("\n")))
+
+
+def get_references_in_files(package_index, files):
+    """Package references whose recipe is touched by any of ``files``.
+
+    A file inside a version folder only affects the versions using that
+    folder. Any other file of a package, e.g. its ``config.yml``, affects all
+    of its versions.
+    """
+    references_by_directory = {}
+    for package_info in package_index:
+        references_by_directory.setdefault(package_info.directory, []).append(
+            package_info.reference
+        )
 
-def get_packages_in_commit(root_path, commit_id):
-    packages = []
-    for file_in_commit in get_files_in_commit(root_path, commit_id):
-        file_components = Path(file_in_commit).parts
-        if len(file_components) >= 3 and file_components[0] == "recipes":
-            package_name = file_components[1]
-            packages.append(package_name)
-    return packages
+    references = set()
+    for file in files:
+        file_components = Path(file).parts
+        if len(file_components) < 3 or file_components[0] != "recipes":
+            continue
+        if len(file_components) > 3:
+            directory = str(Path(*file_components[:3]))
+            if directory in references_by_directory:
+                references.update(references_by_directory[directory])
+                continue
+        references.update(
+            package_info.reference
+            for package_info in package_index.versions(file_components[1])
+        )
+    return references
 
 
-def get_modified_packages_in_commits(root_path, commit_id_list):
-    packages = []
+def get_modified_files(
+    root_path, commit_id_list=(), base_commit_id=None, head_commit_id=None
+):
+    """Files modified by a commit range, or else by a list of commits.
+
+    The range ``base_commit_id...head_commit_id`` is preferred. The commit
+    list is used if there is no usable base, e.g. for the first push of a
+    branch. Raises ``ValueError`` if git cannot read the commit list.
+    """
+    if base_commit_id and base_commit_id != NULL_COMMIT_ID:
+        head_commit_id = head_commit_id or "HEAD"
+        print(f"Commit range {base_commit_id}...{head_commit_id} requested")
+        files = get_files_in_range(root_path, base_commit_id, head_commit_id)
+        if files is not None:
+            return files
+        print("... failed to diff commit range, falling back to the commit list")
+
+    if not commit_id_list:
+        return set()
     for commit_id in commit_id_list:
         print(f"Commit {commit_id} requested as an argument")
-        packages += get_packages_in_commit(root_path, commit_id)
-    return packages
+    files = get_files_in_commits(root_path, commit_id_list)
+    if files is None:
+        raise ValueError(
+            f"Failed to list the files of commits {', '.join(commit_id_list)}"
+        )
+    return files
 
 
 def get_cli_args():
@@ -156,6 +169,20 @@ def get_cli_args():
         nargs="*",
         help="Find packages modified by supplied commits. Commit ids will also be obtained from $ENV[GITHUB_CONTEXT][commits]",
     )
+    parser.add_argument(
+        "--base-commit",
+        help="Find packages modified since the merge base of this commit and --head-commit. Takes precedence over --commit-id",
+    )
+    parser.add_argument(
+        "--head-commit",
+        default="HEAD",
+        help="Head of the commit range used with --base-commit",
+    )
+    parser.add_argument(
+        "--without-dependents",
+        action="store_true",
+        help="Only select modified packages, not the packages depending on them",
+    )
     parser.add_argument(
         "--github-output",
         type=Path,
@@ -187,11 +214,18 @@ def get_github_args():
         else []
     )
 
-    if github.get("event_name") in ["push", "pull_request"]:
+    commit_ids = []
+    base_commit = None
+    head_commit = None
+    if github.get("event_name") == "push":
         commit_obj_list = event.get("commits", [])
         commit_ids = [commit["id"] for commit in commit_obj_list]
-    else:
-        commit_ids = []
+        base_commit = event.get("before")
+        head_commit = event.get("after")
+    elif github.get("event_name") == "pull_request":
+        pull_request = event.get("pull_request", {})
+        base_commit = pull_request.get("base", {}).get("sha")
+        head_commit = pull_request.get("head", {}).get("sha")
 
     github_output = Path(os.environ.get("GITHUB_OUTPUT"))
 
@@ -202,6 +236,9 @@ def get_github_args():
         root_path=root_path,
         recipes_path=recipes_path,
         commit_id=commit_ids,
+        base_commit=base_commit,
+        head_commit=head_commit,
+        without_dependents=False,
         github_output=github_output,
     )
 
@@ -218,26 +255,36 @@ def main():
     else:
         args = get_cli_args()
 
-    package_infos = get_package_infos(args.root_path, args.recipes_path)
-    package_references = [
-        package_info["package_reference"] for package_info in package_infos
-    ]
+    package_index = get_package_index(args.root_path, args.recipes_path)
     selected_packages = get_selected_packages(
-        package_references,
+        package_index.references(),
         args.selection_config,
         args.include_packages,
         args.exclude_packages,
     )
 
-    if args.commit_id:
-        modified_selected_packages = []
-        modified_packages = get_modified_packages_in_commits(
-            args.root_path, args.commit_id
-        )
-        for package_references in selected_packages:
-            if package_references.split("/")[0] in modified_packages:
-                modified_selected_packages.append(package_references)
-        selected_packages = modified_selected_packages
+    if args.commit_id or args.base_commit:
+        try:
+            modified_files = get_modified_files(
+                args.root_path,
+                commit_id_list=args.commit_id or [],
+                base_commit_id=args.base_commit,
+                head_commit_id=args.head_commit,
+            )
+        except ValueError as e:
+            print(e)
+            return 1
+        affected_packages = get_references_in_files(package_index, modified_files)
+        if not args.without_dependents:
+            graph = get_recipe_graph(
+                package_index, args.root_path, get_default_graph_cache_path()
+            )
+            affected_packages = get_transitive_dependents(graph, affected_packages)
+        selected_packages = [
+            package_reference
+            for package_reference in selected_packages
+            if package_reference in affected_packages
+        ]
 
     for package_reference in selected_packages:
         print(package_reference)
@@ -245,9 +292,8 @@ def main():
     if is_github:
         with open(args.github_output, "w") as out:
             selected_package_infos = [
-                package_info
-                for package_info in package_infos
-                if package_info["package_reference"] in selected_packages
+                package_info.to_dict()
+                for package_info in package_index.select(selected_packages)
             ]
             print(f"packages={json.dumps(selected_package_infos)}", file=out)
 
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from definitions import get_recipes_path, get_root_path, get_default_selection_config
+from list_package_references import get_selected_packages
+from package_index import get_package_index
+from recipe_graph import (
+    get_default_graph_cache_path,
+    get_recipe_graph,
+    get_topological_layers,
+    get_transitive_dependents,
+)
+
+NEWEST_VERSION = "newest"
+ALL_VERSIONS = "all"
+
+
+def get_requested_references(package_index, package_names, version):
+    """Package references for ``version`` of each of ``package_names``.
+
+    ``version`` is either a specific version, ``newest`` (also used if it is
+    empty) or ``all``. Raises ``ValueError`` for unknown packages or versions.
+    """
+    version = version or NEWEST_VERSION
+    references = []
+    for package_name in package_names:
+        versions = package_index.versions(package_name)
+        if not versions:
+            raise ValueError(f"Unknown package {package_name}")
+
+        if version == ALL_VERSIONS:
+            references.extend(package_info.reference for package_info in versions)
+        elif version == NEWEST_VERSION:
+            references.append(package_index.newest(package_name).reference)
+        else:
+            reference = f"{package_name}/{version}"
+            if reference not in package_index:
+                raise ValueError(f"Unknown package version {reference}")
+            references.append(reference)
+    return references
+
+
+def get_package_layers(package_index, graph, references):
+    """Group ``references`` into build stages in topological order.
+
+    Every stage only depends on packages of earlier stages, so the binaries
+    built by one stage can be consumed by the next instead of being rebuilt.
+    """
+    return [
+        package_index.select(layer)
+        for layer in get_topological_layers(graph, set(references))
+    ]
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="List requested package versions in topological build stages"
+    )
+    parser.add_argument(
+        "packages",
+        nargs="*",
+        help="Names of the requested packages. Defaults to all packages",
+    )
+    parser.add_argument(
+        "--version",
+        default=NEWEST_VERSION,
+        help=f"Requested version: a specific version, '{NEWEST_VERSION}' or '{ALL_VERSIONS}'",
+    )
+    parser.add_argument(
+        "--with-dependents",
+        action="store_true",
+        help="Also list all packages depending on the requested packages",
+    )
+    parser.add_argument(
+        "--selection-config",
+        type=Path,
+        default=None,
+        help=f"Path to selection config file. Unused default: {get_default_selection_config()}",
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--recipes-path",
+        type=Path,
+        default=get_recipes_path(),
+        help="Path to recipes directory",
+    )
+    parser.add_argument(
+        "--github-output",
+        type=Path,
+        help="Output file for GitHub action",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def get_github_args():
+    root_path = get_root_path()
+    recipes_path = get_recipes_path()
+
+    event = json.loads(os.environ.get("GITHUB_EVENT", "{}"))
+    inputs = event.get("inputs") or {}
+
+    packages = [inputs["package_name"]] if inputs.get("package_name") else []
+    version = inputs.get("package_version") or NEWEST_VERSION
+
+    github_output = Path(os.environ.get("GITHUB_OUTPUT"))
+
+    return argparse.Namespace(
+        packages=packages,
+        version=version,
+        with_dependents=False,
+        selection_config=None,
+        root_path=root_path,
+        recipes_path=recipes_path,
+        github_output=github_output,
+    )
+
+
+def get_is_github():
+    return bool(os.environ.get("GITHUB_ACTIONS", False))
+
+
+def main():
+    is_github = get_is_github()
+
+    if is_github:
+        args = get_github_args()
+    else:
+        args = get_cli_args()
+
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    graph = get_recipe_graph(
+        package_index, args.root_path, get_default_graph_cache_path()
+    )
+
+    try:
+        references = get_requested_references(
+            package_index, args.packages or package_index.packages(), args.version
+        )
+    except ValueError as e:
+        print(e)
+        return 1
+    if args.with_dependents:
+        references = get_transitive_dependents(graph, references)
+    references = get_selected_packages(references, args.selection_config, [], [])
+
+    layers = get_package_layers(package_index, graph, references)
+
+    for index, layer in enumerate(layers):
+        print(f"Stage {index}:")
+        for package_info in layer:
+            print(f"  {package_info.reference}")
+
+    if is_github:
+        with open(args.github_output, "w") as out:
+            print(f"stages={len(layers)}", file=out)
+            for index, layer in enumerate(layers):
+                package_infos = [package_info.to_dict() for package_info in layer]
+                print(f"packages_{index}={json.dumps(package_infos)}", file=out)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+from definitions import get_cache_path
+
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
+PACKAGE_INDEX_FORMAT_VERSION = 1
+
+
+def get_version_key(version):
+    """Sort key ordering versions like Conan does rather than as strings.
+
+    Dot separated items compare numerically where possible, trailing zeros are
+    ignored and a pre-release (``1.0-rc``) sorts before its release (``1.0``).
+    """
+
+    def get_items(text):
+        items = [int(item) if item.isdigit() else item for item in text.split(".")]
+        while len(items) > 1 and items[-1] == 0:
+            items.pop()
+        return tuple(
+            (0, item, "") if isinstance(item, int) else (1, 0, item) for item in items
+        )
+
+    main, _, _ = str(version).partition("+")
+    main, _, pre = main.partition("-")
+    if pre:
+        return get_items(main), 0, get_items(pre)
+    return get_items(main), 1, ()
+
+
+@dataclass(frozen=True, slots=True)
+class PackageInfo:
+    package: str
+    version: str
+    reference: str
+    directory: str
+    conanfile: str = "conanfile.py"
+    test_conanfile: str = "test_package/conanfile.py"
+
+    @classmethod
+    def from_dict(cls, package_info):
+        return cls(
+            package=package_info["package"],
+            version=str(package_info["version"]),
+            reference=package_info["package_reference"],
+            directory=package_info["directory"],
+            conanfile=package_info["conanfile"],
+            test_conanfile=package_info["test_conanfile"],
+        )
+
+    def to_dict(self):
+        """The dict layout used for the GitHub outputs of the scripts."""
+        return {
+            "package": self.package,
+            "version": self.version,
+            "package_reference": self.reference,
+            "directory": self.directory,
+            "conanfile": self.conanfile,
+            "test_conanfile": self.test_conanfile,
+        }
+
+
+class PackageIndex:
+    """All package versions of the index with constant time lookups.
+
+    Iterates in package name order, versions of a package in version order.
+    """
+
+    __slots__ = ("_package_infos", "_by_reference", "_by_package")
+
+    def __init__(self, package_infos):
+        package_infos = [
+            (
+                package_info
+                if isinstance(package_info, PackageInfo)
+                else PackageInfo.from_dict(package_info)
+            )
+            for package_info in package_infos
+        ]
+        package_infos.sort(
+            key=lambda package_info: (
+                package_info.package,
+                get_version_key(package_info.version),
+            )
+        )
+
+        self._package_infos = tuple(package_infos)
+        self._by_reference = {
+            package_info.reference: package_info for package_info in package_infos
+        }
+        self._by_package = {}
+        for package_info in package_infos:
+            self._by_package.setdefault(package_info.package, []).append(package_info)
+
+    def __iter__(self):
+        return iter(self._package_infos)
+
+    def __len__(self):
+        return len(self._package_infos)
+
+    def __contains__(self, reference):
+        return reference in self._by_reference
+
+    def get(self, reference):
+        return self._by_reference.get(reference)
+
+    def references(self):
+        return [package_info.reference for package_info in self._package_infos]
+
+    def packages(self):
+        return list(self._by_package)
+
+    def versions(self, package):
+        """All versions of ``package``, oldest first."""
+        return list(self._by_package.get(package, []))
+
+    def newest(self, package):
+        versions = self._by_package.get(package)
+        if not versions:
+            return None
+        return versions[-1]
+
+    def select(self, references):
+        """The package infos of ``references``, in index order."""
+        references = set(references)
+        return [
+            package_info
+            for package_info in self._package_infos
+            if package_info.reference in references
+        ]
+
+
+def write_json_atomically(path, data):
+    """Write ``data`` as JSON so concurrent readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def get_default_package_index_path():
+    return get_cache_path() / "package-index.json"
+
+
+def load_package_index(package_index_path, root_path, recipes_path):
+    try:
+        with open(package_index_path) as f:
+            package_index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if (
+        package_index.get("format") != PACKAGE_INDEX_FORMAT_VERSION
+        or package_index.get("root_path") != str(root_path)
+        or package_index.get("recipes_path") != str(recipes_path)
+    ):
+        return {}
+    return package_index.get("packages", {})
+
+
+def get_package_infos(
+    root_path, recipes_path, package_index_path=get_default_package_index_path()
+):
+    """List all package versions found in the ``config.yml`` files of the recipes.
+
+    The parsed ``config.yml`` files are kept in a persistent index at
+    ``package_index_path``. Only files whose modification time or size changed
+    since the index was written are parsed again. Pass ``None`` to disable the
+    index.
+    """
+    root_path = Path(root_path)
+    recipes_path = Path(recipes_path)
+
+    cached_packages = {}
+    if package_index_path is not None:
+        cached_packages = load_package_index(
+            package_index_path, root_path, recipes_path
+        )
+    packages = {}
+
+    for package_path in recipes_path.iterdir():
+        if not package_path.is_dir():
+            continue
+
+        config_file = package_path / "config.yml"
+        try:
+            stat = config_file.stat()
+        except FileNotFoundError:
+            continue
+
+        package_name = package_path.name
+        cached = cached_packages.get(package_name, {})
+        if (
+            cached.get("mtime_ns") == stat.st_mtime_ns
+            and cached.get("size") == stat.st_size
+        ):
+            packages[package_name] = cached
+            continue
+
+        with open(config_file) as f:
+            config = yaml.load(f, Loader=YamlSafeLoader)
+
+        packages[package_name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "versions": [
+                [version, str(details["folder"])]
+                for version, details in config["versions"].items()
+            ],
+        }
+
+    if package_index_path is not None and packages != cached_packages:
+        write_json_atomically(
+            package_index_path,
+            {
+                "format": PACKAGE_INDEX_FORMAT_VERSION,
+                "root_path": str(root_path),
+                "recipes_path": str(recipes_path),
+                "packages": packages,
+            },
+        )
+
+    package_infos = []
+
+    for package_name, package in packages.items():
+        package_path = recipes_path / package_name
+        for version, folder in package["versions"]:
+            package_directory = (package_path / folder).relative_to(root_path)
+
+            package_infos.append(
+                {
+                    "package": package_name,
+                    "version": version,
+                    "package_reference": "{}/{}".format(package_name, version),
+                    "directory": str(package_directory),
+                    "conanfile": "conanfile.py",
+                    "test_conanfile": "test_package/conanfile.py",
+                }
+            )
+
+    package_infos.sort(key=lambda x: (x["package"], x["version"]))
+
+    return package_infos
+
+
+def get_package_index(
+    root_path, recipes_path, package_index_path=get_default_package_index_path()
+):
+    return PackageIndex(get_package_infos(root_path, recipes_path, package_index_path))
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+import yaml
+
+from definitions import (
+    get_cache_path,
+    get_conan_home_path,
+    get_default_selection_config,
+    get_recipes_path,
+    get_root_path,
+)
+from list_package_references import get_selected_packages
+from package_index import YamlSafeLoader, get_package_index, write_json_atomically
+
+CHUNK_SIZE = 1024 * 1024
+
+# Branch archives change with every commit, pinning them in a recipe is wrong
+MOVING_URL = re.compile(r"/refs/heads/|/archive/(main|master)\.")
+
+
+def get_default_store_path():
+    return get_cache_path() / "sources"
+
+
+def get_blob_path(store_path, sha256):
+    """Path of a source in the store, laid out like Conan's
+    ``core.sources:download_cache`` so Conan can use the store directly."""
+    return Path(store_path) / "s" / sha256
+
+
+def get_pins_path(store_path):
+    return Path(store_path) / "pins.json"
+
+
+def load_pins(store_path):
+    try:
+        with open(get_pins_path(store_path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def get_source_entries(package_infos, root_path):
+    """The sources of every package version as ``conandata.yml`` lists them.
+
+    Returns a list of dicts with the ``references`` using the source, its
+    ``urls`` and its ``sha256``, which is ``None`` if the recipe has none.
+    Sources shared by several versions are listed once.
+    """
+    conandata = {}
+    entries = {}
+    for package_info in package_infos:
+        directory = package_info.directory
+        if directory not in conandata:
+            try:
+                with open(Path(root_path) / directory / "conandata.yml") as f:
+                    conandata[directory] = yaml.load(f, Loader=YamlSafeLoader) or {}
+            except FileNotFoundError:
+                conandata[directory] = {}
+
+        source = (conandata[directory].get("sources") or {}).get(package_info.version)
+        # Some recipes nest the arguments of get() one level deeper
+        if isinstance(source, dict) and "url" not in source and len(source) == 1:
+            source = next(iter(source.values()))
+        if isinstance(source, dict):
+            source = [source]
+        if not isinstance(source, list):
+            continue
+
+        for item in source:
+            if not isinstance(item, dict) or "url" not in item:
+                continue
+            urls = item["url"] if isinstance(item["url"], list) else [item["url"]]
+            sha256 = item.get("sha256")
+            key = sha256 or urls[0]
+            entry = entries.setdefault(
+                key, {"references": [], "urls": urls, "sha256": sha256}
+            )
+            entry["references"].append(package_info.reference)
+
+    return list(entries.values())
+
+
+_sessions = threading.local()
+
+
+def get_session():
+    """One ``requests.Session`` per thread, so connections are reused."""
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+def download_to_store(url, store_path, expected_sha256, retries=3):
+    """Stream ``url`` into the store, hashing while downloading.
+
+    Interrupted transfers are resumed from the partial file with a range
+    request. Returns the sha256 of the download. Raises ``ValueError`` if it
+    does not match ``expected_sha256``.
+    """
+    partial_path = (
+        Path(store_path)
+        / "s"
+        / f"{expected_sha256 or hashlib.sha256(url.encode()).hexdigest()}.part"
+    )
+    partial_path.parent.mkdir(parents=True, exist_ok=True)
+
+    for attempt in range(retries):
+        digest = hashlib.sha256()
+        offset = 0
+        if partial_path.is_file():
+            with open(partial_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    offset += len(chunk)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with get_session().get(
+                url, headers=headers, stream=True, timeout=60
+            ) as response:
+                if response.status_code == 416:
+                    # The partial file is already complete
+                    pass
+                else:
+                    response.raise_for_status()
+                    mode = "ab"
+                    if offset and response.status_code != 206:
+                        # The server ignored the range, start over
+                        digest = hashlib.sha256()
+                        mode = "wb"
+                    with open(partial_path, mode) as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            digest.update(chunk)
+                            f.write(chunk)
+            break
+        except requests.ConnectionError:
+            if attempt == retries - 1:
+                raise
+            print(f"... connection to {url} lost, resuming")
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 is not None and sha256 != expected_sha256:
+        partial_path.unlink()
+        raise ValueError(f"sha256 of {url} is {sha256}, expected {expected_sha256}")
+    os.replace(partial_path, get_blob_path(store_path, sha256))
+    return sha256
+
+
+def write_blob_metadata(store_path, sha256, entry):
+    """Record which references and urls a blob belongs to, in the format of the
+    ``.json`` files Conan writes next to its backup sources."""
+    metadata_path = Path(f"{get_blob_path(store_path, sha256)}.json")
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        metadata = {"references": {}, "timestamp": time.time()}
+    for reference in entry["references"]:
+        urls = metadata["references"].setdefault(reference, [])
+        urls.extend(url for url in entry["urls"] if url not in urls)
+    write_json_atomically(metadata_path, metadata)
+
+
+def prefetch_entry(entry, store_path, pins):
+    """Make sure the source of ``entry`` is in the store.
+
+    Sources without a sha256 are checked against their pin, if any. Returns
+    ``(sha256, status)`` with status ``cached``, ``downloaded`` or
+    ``failed: <reason>``.
+    """
+    sha256 = entry["sha256"] or pins.get(entry["urls"][0])
+    if sha256 is not None and get_blob_path(store_path, sha256).is_file():
+        return sha256, "cached"
+
+    errors = []
+    for url in entry["urls"]:
+        try:
+            sha256 = download_to_store(url, store_path, sha256)
+        except (requests.RequestException, ValueError) as e:
+            errors.append(str(e))
+            continue
+        write_blob_metadata(store_path, sha256, entry)
+        return sha256, "downloaded"
+    return sha256, "failed: " + "; ".join(errors)
+
+
+def prefetch_sources(entries, store_path, jobs):
+    """Fetch all ``entries`` into the store concurrently.
+
+    Sources without a sha256 are pinned to the sha256 of their first fetch in
+    ``pins.json``, except for branch archives. Returns a list of ``(entry, sha256, status)``.
+    """
+    pins = load_pins(store_path)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(
+            executor.map(lambda entry: prefetch_entry(entry, store_path, pins), entries)
+        )
+
+    new_pins = dict(pins)
+    for entry, (sha256, status) in zip(entries, results):
+        if (
+            entry["sha256"] is None
+            and not status.startswith("failed")
+            and not MOVING_URL.search(entry["urls"][0])
+        ):
+            new_pins[entry["urls"][0]] = sha256
+    if new_pins != pins:
+        write_json_atomically(get_pins_path(store_path), new_pins)
+
+    return [
+        (entry, sha256, status) for entry, (sha256, status) in zip(entries, results)
+    ]
+
+
+def pin_conandata(root_path, package_index, entry, sha256):
+    """Add the pinned sha256 after the url of ``entry`` in its ``conandata.yml``
+    files. Returns the list of files changed."""
+    changed = []
+    url = entry["urls"][0]
+    directories = {
+        package_index.get(reference).directory for reference in entry["references"]
+    }
+    for directory in sorted(directories):
+        conandata_path = Path(root_path) / directory / "conandata.yml"
+        lines = conandata_path.read_text().splitlines(keepends=True)
+        for index, line in enumerate(lines):
+            match = re.match(
+                r"^(\s*)url:\s*[\"']?" + re.escape(url) + r"[\"']?\s*$", line
+            )
+            if match:
+                lines.insert(index + 1, f'{match.group(1)}sha256: "{sha256}"\n')
+                conandata_path.write_text("".join(lines))
+                changed.append(str(conandata_path.relative_to(root_path)))
+                break
+    return changed
+
+
+def configure_conan(store_path, conan_home_path):
+    """Point ``core.sources:download_cache`` of the conan home at the store."""
+    global_conf = Path(conan_home_path) / "global.conf"
+    lines = []
+    if global_conf.is_file():
+        lines = [
+            line
+            for line in global_conf.read_text().splitlines()
+            if not line.startswith("core.sources:download_cache")
+        ]
+    lines.append(f"core.sources:download_cache={Path(store_path).resolve()}")
+    global_conf.parent.mkdir(parents=True, exist_ok=True)
+    global_conf.write_text("\n".join(lines) + "\n")
+    return global_conf
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Download the sources of all recipes into a local content addressed store"
+    )
+    parser.add_argument(
+        "--include-packages",
+        nargs="*",
+        default=[],
+        help="Include patterns for package selection",
+    )
+    parser.add_argument(
+        "--exclude-packages",
+        nargs="*",
+        default=[],
+        help="Exclude patterns for package selection",
+    )
+    parser.add_argument(
+        "--selection-config",
+        type=Path,
+        default=None,
+        help=f"Path to selection config file. Unused default: {get_default_selection_config()}",
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--recipes-path",
+        type=Path,
+        default=get_recipes_path(),
+        help="Path to recipes directory",
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=get_default_store_path(),
+        help="Path to the source store",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=8,
+        help="Number of concurrent downloads",
+    )
+    parser.add_argument(
+        "--pin-conandata",
+        action="store_true",
+        help="Write the pinned sha256 of sources without one into their conandata.yml, except for branch archives",
+    )
+    parser.add_argument(
+        "--configure-conan",
+        action="store_true",
+        help="Set core.sources:download_cache of the conan home to the store, so builds take their sources from it",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    selected_packages = get_selected_packages(
+        package_index.references(),
+        args.selection_config,
+        args.include_packages,
+        args.exclude_packages,
+    )
+    entries = get_source_entries(
+        package_index.select(selected_packages), args.root_path
+    )
+
+    start = time.perf_counter()
+    results = prefetch_sources(entries, args.store, args.jobs)
+    duration = time.perf_counter() - start
+
+    failed = 0
+    for entry, sha256, status in results:
+        if status.startswith("failed"):
+            failed += 1
+        if status != "cached":
+            print(f"{status:<10} {sha256 or '-':<64} {entry['urls'][0]}")
+        if args.pin_conandata and entry["sha256"] is None and sha256 is not None:
+            if MOVING_URL.search(entry["urls"][0]):
+                continue
+            for conandata in pin_conandata(
+                args.root_path, package_index, entry, sha256
+            ):
+                print(f"Pinned {entry['urls'][0]} in {conandata}")
+    print(
+        f"Prefetched {len(results)} sources into {args.store} in {duration:.2f}s, "
+        f"{failed} failed"
+    )
+
+    if args.configure_conan:
+        global_conf = configure_conan(args.store, get_conan_home_path())
+        print(f"Set core.sources:download_cache in {global_conf}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
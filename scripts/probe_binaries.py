@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from conan_driver import CONAN_DRIVERS, SubprocessConanDriver, get_conan_driver
+from definitions import get_root_path, get_cache_path
+from package_index import write_json_atomically
+
+PROBE_CACHE_FORMAT_VERSION = 1
+
+DEFAULT_TTL = 60 * 60
+
+
+def get_default_probe_cache_path():
+    return get_cache_path() / "binary-probe.json"
+
+
+def load_probe_cache(cache_path):
+    cache = {}
+    if cache_path is not None:
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+    if cache.get("format") != PROBE_CACHE_FORMAT_VERSION:
+        cache = {}
+    cache["format"] = PROBE_CACHE_FORMAT_VERSION
+    cache.setdefault("package_ids", {})
+    cache.setdefault("remote_packages", {})
+    return cache
+
+
+def get_cached(entries, key, ttl, now):
+    entry = entries.get(key)
+    if entry is None or now - entry["time"] > ttl:
+        return None
+    return entry["value"]
+
+
+def run_conan_json(command, root_path, driver):
+    """Run a conan command with ``--format=json`` and return its parsed output.
+
+    Returns ``None`` if the command fails.
+    """
+    proc = driver.run(
+        command + ["--format=json"], cwd=root_path, stderr=subprocess.PIPE
+    )
+    if proc.returncode != 0:
+        return None
+    try:
+        return json.loads(proc.stdout)
+    except json.JSONDecodeError:
+        return None
+
+
+def get_local_packages(root_path, driver):
+    """Map every reference in the local cache to its latest recipe revision and
+    the set of package ids built for it, with a single ``conan list`` call."""
+    result = run_conan_json(["conan", "list", "*#latest:*"], root_path, driver)
+    if result is None:
+        return {}
+
+    local_packages = {}
+    for reference, details in result.get("Local Cache", {}).items():
+        for revision, revision_details in details.get("revisions", {}).items():
+            local_packages[reference] = (
+                revision,
+                set(revision_details.get("packages", {})),
+            )
+    return local_packages
+
+
+def get_remote_package_ids(reference, revision, remote, root_path, driver):
+    """The package ids built for ``reference#revision`` on ``remote``."""
+    result = run_conan_json(
+        ["conan", "list", f"{reference}#{revision}:*", "--remote", remote],
+        root_path,
+        driver,
+    )
+    if result is None:
+        return None
+
+    package_ids = set()
+    for details in result.get(remote, {}).values():
+        if not isinstance(details, dict):
+            continue
+        for revision_details in details.get("revisions", {}).values():
+            package_ids.update(revision_details.get("packages", {}))
+    return package_ids
+
+
+def get_lockfile_path(package_info, root_path):
+    lockfile = Path(root_path) / package_info["directory"] / "conan.lock"
+    return lockfile if lockfile.is_file() else None
+
+
+def get_package_id_key(package_info, revision, config, lockfile):
+    lock_hash = hashlib.sha256(lockfile.read_bytes()).hexdigest() if lockfile else ""
+    return "|".join(
+        [
+            f"{package_info['package_reference']}#{revision}",
+            config["build_profile"],
+            config["host_profile"],
+            lock_hash,
+        ]
+    )
+
+
+def get_expected_package_id(package_info, config, lockfile, root_path, driver):
+    """Compute the package id ``conan create`` would build for ``config``."""
+    conanfile_path = Path(package_info["directory"]) / package_info["conanfile"]
+    command = [
+        "conan",
+        "graph",
+        "info",
+        str(conanfile_path),
+        "--version",
+        package_info["version"],
+        "--profile:build",
+        config["build_profile"],
+        "--profile:host",
+        config["host_profile"],
+    ]
+    if lockfile is not None:
+        command += ["--lockfile", str(lockfile.relative_to(root_path))]
+
+    result = run_conan_json(command, root_path, driver)
+    if result is None:
+        return None
+    return result["graph"]["nodes"]["0"].get("package_id")
+
+
+def probe_build_matrix(
+    build_matrix,
+    root_path,
+    remotes=(),
+    jobs=1,
+    cache_path=None,
+    ttl=DEFAULT_TTL,
+    driver=None,
+):
+    """Split ``build_matrix`` into entries that still need a build and entries
+    whose binary already exists in the local cache or one of ``remotes``.
+
+    The local cache is listed once. Package ids and remote listings are
+    computed concurrently, remote listings once per recipe revision. Both
+    are cached in ``cache_path`` for ``ttl`` seconds.
+    """
+    root_path = Path(root_path)
+    if driver is None:
+        driver = SubprocessConanDriver()
+    cache = load_probe_cache(cache_path)
+    now = time.time()
+
+    local_packages = get_local_packages(root_path, driver)
+
+    probes = []
+    for entry in build_matrix:
+        package_info = entry["package"]
+        reference = package_info["package_reference"]
+        if reference not in local_packages:
+            # Not exported, the revision to look for is unknown
+            probes.append((entry, None, None))
+            continue
+        revision, _ = local_packages[reference]
+        lockfile = get_lockfile_path(package_info, root_path)
+        key = get_package_id_key(package_info, revision, entry["config"], lockfile)
+        probes.append((entry, key, lockfile))
+
+    def get_package_id(probe):
+        entry, key, lockfile = probe
+        if key is None:
+            return None
+        package_id = get_cached(cache["package_ids"], key, ttl, now)
+        if package_id is None:
+            package_id = get_expected_package_id(
+                entry["package"], entry["config"], lockfile, root_path, driver
+            )
+            if package_id is not None:
+                cache["package_ids"][key] = {"value": package_id, "time": now}
+        return package_id
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        package_ids = list(executor.map(get_package_id, probes))
+
+    remote_queries = set()
+    for (entry, _, _), package_id in zip(probes, package_ids):
+        reference = entry["package"]["package_reference"]
+        if package_id is None or package_id in local_packages[reference][1]:
+            continue
+        for remote in remotes:
+            remote_queries.add((reference, local_packages[reference][0], remote))
+
+    def get_remote_packages(query):
+        reference, revision, remote = query
+        key = f"{remote}|{reference}#{revision}"
+        remote_package_ids = get_cached(cache["remote_packages"], key, ttl, now)
+        if remote_package_ids is None:
+            remote_package_ids = get_remote_package_ids(
+                reference, revision, remote, root_path, driver
+            )
+            if remote_package_ids is None:
+                return query, set()
+            remote_package_ids = sorted(remote_package_ids)
+            cache["remote_packages"][key] = {"value": remote_package_ids, "time": now}
+        return query, set(remote_package_ids)
+
+    remote_queries = sorted(remote_queries)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        remote_packages = dict(executor.map(get_remote_packages, remote_queries))
+
+    if cache_path:
+        write_json_atomically(cache_path, cache)
+
+    required = []
+    available = []
+    for (entry, _, _), package_id in zip(probes, package_ids):
+        reference = entry["package"]["package_reference"]
+        if package_id is None:
+            required.append(entry)
+            continue
+        revision, local_package_ids = local_packages[reference]
+        if package_id in local_package_ids or any(
+            package_id in remote_packages.get((reference, revision, remote), set())
+            for remote in remotes
+        ):
+            available.append(entry)
+        else:
+            required.append(entry)
+
+    return required, available
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Drop build matrix entries whose binaries already exist"
+    )
+    parser.add_argument(
+        "matrix_json",
+        type=Path,
+        help="Build matrix as written to the matrix output of list_build_matrix.py --packages-json. Use - for stdin",
+    )
+    parser.add_argument(
+        "--remote",
+        "-r",
+        nargs="*",
+        default=[],
+        help="Remotes to look for binaries in, in addition to the local cache",
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of concurrent conan queries",
+    )
+    parser.add_argument(
+        "--probe-cache",
+        type=Path,
+        default=get_default_probe_cache_path(),
+        help="Path to the cache of computed package ids and remote listings",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=int,
+        default=DEFAULT_TTL,
+        help="Seconds cached probe results stay valid",
+    )
+    parser.add_argument(
+        "--conan-driver",
+        choices=sorted(CONAN_DRIVERS),
+        default="subprocess",
+        help="Run conan commands in a subprocess each or in-process through the Conan API",
+    )
+    parser.add_argument(
+        "--github-output",
+        type=Path,
+        help="Output file for GitHub action",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    if str(args.matrix_json) == "-":
+        build_matrix = json.load(sys.stdin)
+    else:
+        with open(args.matrix_json) as f:
+            build_matrix = json.load(f)
+
+    jobs = args.jobs
+    if args.conan_driver == "api" and jobs > 1:
+        print("The Conan API driver runs one command at a time, using 1 job")
+        jobs = 1
+
+    start = time.perf_counter()
+    required, available = probe_build_matrix(
+        build_matrix,
+        args.root_path,
+        remotes=args.remote,
+        jobs=jobs,
+        cache_path=args.probe_cache,
+        ttl=args.ttl,
+        driver=get_conan_driver(args.conan_driver),
+    )
+    duration = time.perf_counter() - start
+
+    for entry in available:
+        print(
+            f"Available {entry['package']['package_reference']} "
+            f"{entry['config']['host_profile']}"
+        )
+    for entry in required:
+        print(
+            f"Required {entry['package']['package_reference']} "
+            f"{entry['config']['host_profile']}"
+        )
+    print(
+        f"Probed {len(build_matrix)} matrix entries in {duration:.2f}s, "
+        f"{len(available)} already built, {len(required)} to build"
+    )
+
+    if args.github_output:
+        with open(args.github_output, "w") as out:
+            print(f"matrix={json.dumps(required)}", file=out)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
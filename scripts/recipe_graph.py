@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import json
+import sys
+from pathlib import Path
+
+from definitions import get_recipes_path, get_root_path, get_cache_path
+from package_index import get_package_index, get_version_key, write_json_atomically
+
+REQUIREMENT_METHODS = ("requires", "tool_requires", "build_requires", "test_requires")
+
+CACHE_FORMAT_VERSION = 2
+
+
+def get_default_graph_cache_path():
+    return get_cache_path() / "recipe-graph.json"
+
+
+def _is_self_attribute(node, attribute):
+    return (
+        isinstance(node, ast.Attribute)
+        and node.attr == attribute
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "self"
+    )
+
+
+class _RequirementCollector(ast.NodeVisitor):
+    """Collect ``self.requires("...")`` style calls and ``python_requires``
+    attributes with their enclosing conditions.
+
+    Every requirement is recorded, conditional or not. The conditions are kept
+    as source text together with the branch taken, so they can be evaluated
+    later for a specific version.
+    """
+
+    def __init__(self):
+        self.requirements = []
+        self._conditions = []
+
+    def visit_If(self, node):
+        condition = ast.unparse(node.test)
+        self.visit(node.test)
+        self._conditions.append([condition, True])
+        for child in node.body:
+            self.visit(child)
+        self._conditions[-1] = [condition, False]
+        for child in node.orelse:
+            self.visit(child)
+        self._conditions.pop()
+
+    def visit_Assign(self, node):
+        # python_requires is a class attribute, not a method call
+        if any(
+            isinstance(target, ast.Name) and target.id == "python_requires"
+            for target in node.targets
+        ):
+            values = (
+                node.value.elts
+                if isinstance(node.value, (ast.List, ast.Tuple))
+                else [node.value]
+            )
+            for value in values:
+                if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                    self.requirements.append(
+                        {
+                            "reference": value.value,
+                            "method": "python_requires",
+                            "conditions": [list(c) for c in self._conditions],
+                        }
+                    )
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if (
+            isinstance(func, ast.Attribute)
+            and func.attr in REQUIREMENT_METHODS
+            and isinstance(func.value, ast.Name)
+            and func.value.id == "self"
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            self.requirements.append(
+                {
+                    "reference": node.args[0].value,
+                    "method": func.attr,
+                    "conditions": [list(c) for c in self._conditions],
+                }
+            )
+        self.generic_visit(node)
+
+
+def get_conanfile_requirements(conanfile_path):
+    """Statically extract all string literal requirements of a conanfile."""
+    with open(conanfile_path) as f:
+        tree = ast.parse(f.read(), filename=str(conanfile_path))
+
+    collector = _RequirementCollector()
+    collector.visit(tree)
+    return collector.requirements
+
+
+def _evaluate_condition(node, version):
+    """Evaluate a condition for ``version``.
+
+    Only comparisons of ``Version(self.version)`` or ``self.version`` against a
+    string literal can be decided statically. Returns ``None`` for anything
+    else, e.g. conditions on settings or options.
+    """
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate_condition(value, version) for value in node.values]
+        if isinstance(node.op, ast.And):
+            if False in values:
+                return False
+            return None if None in values else True
+        if True in values:
+            return True
+        return None if None in values else False
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        value = _evaluate_condition(node.operand, version)
+        return None if value is None else not value
+
+    if (
+        isinstance(node, ast.Compare)
+        and len(node.ops) == 1
+        and isinstance(node.comparators[0], ast.Constant)
+        and isinstance(node.comparators[0].value, str)
+    ):
+        left = node.left
+        if (
+            isinstance(left, ast.Call)
+            and isinstance(left.func, ast.Name)
+            and left.func.id == "Version"
+            and len(left.args) == 1
+        ):
+            left = left.args[0]
+        if not _is_self_attribute(left, "version"):
+            return None
+
+        lhs = get_version_key(version)
+        rhs = get_version_key(node.comparators[0].value)
+        op = node.ops[0]
+        if isinstance(op, ast.Eq):
+            return lhs == rhs
+        if isinstance(op, ast.NotEq):
+            return lhs != rhs
+        if isinstance(op, ast.Lt):
+            return lhs < rhs
+        if isinstance(op, ast.LtE):
+            return lhs <= rhs
+        if isinstance(op, ast.Gt):
+            return lhs > rhs
+        if isinstance(op, ast.GtE):
+            return lhs >= rhs
+
+    return None
+
+
+def is_requirement_possible(requirement, version):
+    """Whether ``requirement`` can apply to ``version`` of its recipe.
+
+    Conditions that cannot be decided statically are assumed to hold, so the
+    result over-approximates the real dependencies.
+    """
+    for condition, expected in requirement["conditions"]:
+        value = _evaluate_condition(ast.parse(condition, mode="eval").body, version)
+        if value is not None and value != expected:
+            return False
+    return True
+
+
+def get_requirement_reference(requirement):
+    return requirement["reference"].split("#")[0].split("@")[0]
+
+
+def load_graph_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cache.get("format") != CACHE_FORMAT_VERSION:
+        return {}
+    return cache
+
+
+def get_recipe_graph(package_index, root_path, cache_path=None):
+    """Build the dependency graph between the packages of this index.
+
+    Returns a dict mapping every package reference in ``package_index`` to the
+    sorted list of package references of this index it requires, through any
+    kind of requirement. Requirements on packages outside the index are left
+    out. If ``cache_path`` is given, parsed conanfiles are cached there and only
+    reparsed when their modification time or size changes.
+    """
+    root_path = Path(root_path)
+    cache = load_graph_cache(cache_path) if cache_path else {}
+    cached_conanfiles = cache.get("conanfiles", {})
+    conanfiles = {}
+
+    references = set(package_index.references())
+    graph = {}
+
+    for package_info in package_index:
+        conanfile = str(Path(package_info.directory) / package_info.conanfile)
+        if conanfile not in conanfiles:
+            stat = (root_path / conanfile).stat()
+            cached = cached_conanfiles.get(conanfile, {})
+            if (
+                cached.get("mtime_ns") == stat.st_mtime_ns
+                and cached.get("size") == stat.st_size
+            ):
+                conanfiles[conanfile] = cached
+            else:
+                conanfiles[conanfile] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "requirements": get_conanfile_requirements(root_path / conanfile),
+                }
+
+        dependencies = set()
+        for requirement in conanfiles[conanfile]["requirements"]:
+            reference = get_requirement_reference(requirement)
+            if reference not in references:
+                continue
+            if not is_requirement_possible(requirement, package_info.version):
+                continue
+            dependencies.add(reference)
+        graph[package_info.reference] = sorted(dependencies)
+
+    if cache_path and (conanfiles != cached_conanfiles or graph != cache.get("graph")):
+        write_json_atomically(
+            cache_path,
+            {
+                "format": CACHE_FORMAT_VERSION,
+                "conanfiles": conanfiles,
+                "graph": graph,
+            },
+        )
+
+    return graph
+
+
+def get_reverse_graph(graph):
+    """Map every package reference to the sorted list of its direct dependents."""
+    reverse_graph = {reference: [] for reference in graph}
+    for reference, dependencies in graph.items():
+        for dependency in dependencies:
+            reverse_graph[dependency].append(reference)
+    for dependents in reverse_graph.values():
+        dependents.sort()
+    return reverse_graph
+
+
+def get_transitive_dependents(graph, references):
+    """All references depending on ``references``, directly or transitively.
+
+    The result includes ``references`` themselves.
+    """
+    reverse_graph = get_reverse_graph(graph)
+    dependents = set(references)
+    stack = list(dependents)
+    while stack:
+        for dependent in reverse_graph.get(stack.pop(), []):
+            if dependent not in dependents:
+                dependents.add(dependent)
+                stack.append(dependent)
+    return dependents
+
+
+def get_transitive_dependencies(graph, references):
+    """All references ``references`` depend on, directly or transitively.
+
+    The result includes ``references`` themselves.
+    """
+    dependencies = set(references)
+    stack = list(dependencies)
+    while stack:
+        for dependency in graph.get(stack.pop(), []):
+            if dependency not in dependencies:
+                dependencies.add(dependency)
+                stack.append(dependency)
+    return dependencies
+
+
+def get_topological_layers(graph, references=None):
+    """Group ``references`` into layers which only depend on earlier layers.
+
+    Dependencies outside ``references`` are ignored. Defaults to all references
+    in ``graph``. Raises ``ValueError`` if the graph contains a cycle.
+    """
+    if references is None:
+        references = graph.keys()
+    remaining = {
+        reference: {
+            dependency
+            for dependency in graph.get(reference, [])
+            if dependency in references
+        }
+        for reference in references
+    }
+
+    layers = []
+    while remaining:
+        layer = sorted(
+            reference
+            for reference, dependencies in remaining.items()
+            if not dependencies
+        )
+        if not layer:
+            raise ValueError(f"Dependency cycle between {sorted(remaining)}")
+        for reference in layer:
+            del remaining[reference]
+        for dependencies in remaining.values():
+            dependencies.difference_update(layer)
+        layers.append(layer)
+
+    return layers
+
+
+def get_cli_args():
+    parser = argparse.ArgumentParser(
+        description="Print the recipe dependency graph in topological layers"
+    )
+    parser.add_argument(
+        "--root-path",
+        type=Path,
+        default=get_root_path(),
+        help="Path to root directory",
+    )
+    parser.add_argument(
+        "--recipes-path",
+        type=Path,
+        default=get_recipes_path(),
+        help="Path to recipes directory",
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=get_default_graph_cache_path(),
+        help="Path to the parsed conanfile cache",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse all conanfiles without reading or writing the cache",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the graph as JSON",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_cli_args()
+
+    package_index = get_package_index(args.root_path, args.recipes_path)
+    graph = get_recipe_graph(
+        package_index,
+        args.root_path,
+        cache_path=None if args.no_cache else args.cache_path,
+    )
+
+    if args.json:
+        print(json.dumps(graph, indent=4))
+        return 0
+
+    for index, layer in enumerate(get_topological_layers(graph)):
+        print(f"Layer {index}:")
+        for reference in layer:
+            dependencies = ", ".join(graph[reference]) or "-"
+            print(f"  {reference} <- {dependencies}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
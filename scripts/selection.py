@@ -0,0 +1,274 @@
+import fnmatch
+import functools
+import os
+import re
+from pathlib import Path
+
+import yaml
+
+from package_index import YamlSafeLoader
+
+
+def item_to_list(item_or_list):
+    if isinstance(item_or_list, list):
+        return item_or_list
+    return [item_or_list]
+
+
+class PatternMatcher:
+    """A list of ``fnmatch`` patterns compiled into a single regular expression.
+
+    Matches like ``fnmatch.fnmatch`` against any of the patterns. An empty list
+    matches nothing.
+    """
+
+    __slots__ = ("patterns", "_match")
+
+    def __init__(self, patterns):
+        self.patterns = tuple(item_to_list(patterns))
+        if not self.patterns:
+            self._match = None
+            return
+        regex = "|".join(
+            f"(?:{fnmatch.translate(os.path.normcase(pattern))})"
+            for pattern in self.patterns
+        )
+        self._match = re.compile(regex).match
+
+    def __call__(self, name):
+        return (
+            self._match is not None and self._match(os.path.normcase(name)) is not None
+        )
+
+
+class PatternSelector:
+    """Include/exclude pattern lists with memoized results.
+
+    A name is selected if it matches an include pattern and no exclude
+    pattern. Without include patterns everything is included.
+    """
+
+    __slots__ = ("_include", "_exclude", "_results")
+
+    def __init__(self, include, exclude):
+        self._include = PatternMatcher(item_to_list(include) or ["*"])
+        self._exclude = PatternMatcher(exclude)
+        self._results = {}
+
+    def __call__(self, name):
+        result = self._results.get(name)
+        if result is None:
+            result = self._include(name) and not self._exclude(name)
+            self._results[name] = result
+        return result
+
+
+class BuildMatrixSelector:
+    """Decides which (package reference, platform, profile) tuples get built.
+
+    Platforms and profiles are filtered with include/exclude patterns, then
+    the ``rules`` are applied in order and the last matching rule decides.
+    The rules matching a package reference are looked up once per reference,
+    and results are memoized per tuple.
+    """
+
+    __slots__ = ("_platforms", "_profiles", "_rules", "_package_rules", "_results")
+
+    def __init__(
+        self,
+        include_platforms,
+        exclude_platforms,
+        include_profiles,
+        exclude_profiles,
+        rules,
+    ):
+        self._platforms = PatternSelector(include_platforms, exclude_platforms)
+        self._profiles = PatternSelector(include_profiles, exclude_profiles)
+        self._rules = [
+            (
+                index,
+                rule["type"],
+                PatternMatcher(rule.get("packages", "*")),
+                PatternMatcher(rule.get("platforms", "*")),
+                PatternMatcher(rule.get("profiles", "*")),
+            )
+            for index, rule in enumerate(rules)
+            if rule["type"] in ("include", "exclude")
+        ]
+        self._package_rules = {}
+        self._results = {}
+
+    def __call__(self, package_reference, platform, profile):
+        key = (package_reference, platform, profile)
+        result = self._results.get(key)
+        if result is None:
+            result = self._decide(package_reference, platform, profile)
+            self._results[key] = result
+        return result[0]
+
+    def explain(self, package_reference, platform, profile):
+        """Whether the tuple is selected and a description of what decided it."""
+        self(package_reference, platform, profile)
+        selected, rule = self._results[(package_reference, platform, profile)]
+        if rule == "platforms":
+            reason = "platform patterns"
+        elif rule == "profiles":
+            reason = "profile patterns"
+        elif rule is None:
+            reason = "no matching rule"
+        else:
+            reason = f"rules[{rule}]"
+        return selected, reason
+
+    def _get_package_rules(self, package_reference):
+        """The rules matching ``package_reference``, last rule first."""
+        package_rules = self._package_rules.get(package_reference)
+        if package_rules is None:
+            package_rules = [
+                (index, rule_type, platforms, profiles)
+                for index, rule_type, packages, platforms, profiles in reversed(
+                    self._rules
+                )
+                if packages(package_reference)
+            ]
+            self._package_rules[package_reference] = package_rules
+        return package_rules
+
+    def _decide(self, package_reference, platform, profile):
+        if not self._platforms(platform):
+            return False, "platforms"
+        if not self._profiles(profile):
+            return False, "profiles"
+
+        for index, rule_type, platforms, profiles in self._get_package_rules(
+            package_reference
+        ):
+            if platforms(platform) and profiles(profile):
+                return rule_type == "include", index
+        return True, None
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw_rules(frozen_rules):
+    return [
+        {key: list(item) if isinstance(item, tuple) else item for key, item in rule}
+        for rule in frozen_rules
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_build_matrix_selector(
+    include_platforms, exclude_platforms, include_profiles, exclude_profiles, rules
+):
+    return BuildMatrixSelector(
+        list(include_platforms),
+        list(exclude_platforms),
+        list(include_profiles),
+        list(exclude_profiles),
+        _thaw_rules(rules),
+    )
+
+
+def get_build_matrix_selector(
+    include_platforms, exclude_platforms, include_profiles, exclude_profiles, rules
+):
+    """A shared ``BuildMatrixSelector`` per distinct configuration.
+
+    Repeated calls with the same patterns and rules reuse the compiled
+    patterns and memoized decisions.
+    """
+    return _get_build_matrix_selector(
+        _freeze(item_to_list(include_platforms)),
+        _freeze(item_to_list(exclude_platforms)),
+        _freeze(item_to_list(include_profiles)),
+        _freeze(item_to_list(exclude_profiles)),
+        _freeze(rules),
+    )
+
+
+class SelectionConfig:
+    """A parsed selection config like ``defaults.yaml``.
+
+    Holds the package, platform and profile include/exclude lists and the
+    ordered ``rules``. Use ``get_selection_config`` to load each file only
+    once per process.
+    """
+
+    __slots__ = (
+        "include_packages",
+        "exclude_packages",
+        "include_platforms",
+        "exclude_platforms",
+        "include_profiles",
+        "exclude_profiles",
+        "rules",
+    )
+
+    def __init__(self, config=None):
+        config = config or {}
+
+        def get_patterns(section, key):
+            return item_to_list((config.get(section) or {}).get(key, []))
+
+        self.include_packages = get_patterns("packages", "include")
+        self.exclude_packages = get_patterns("packages", "exclude")
+        self.include_platforms = get_patterns("platforms", "include")
+        self.exclude_platforms = get_patterns("platforms", "exclude")
+        self.include_profiles = get_patterns("profiles", "include")
+        self.exclude_profiles = get_patterns("profiles", "exclude")
+        self.rules = list(config.get("rules") or [])
+
+    def get_package_selector(self, include_packages=(), exclude_packages=()):
+        """Package selection, overridden by any given include/exclude patterns."""
+        if include_packages or exclude_packages:
+            return get_package_selector(include_packages, exclude_packages)
+        return get_package_selector(self.include_packages, self.exclude_packages)
+
+    def get_build_matrix_selector(self, include_platforms=(), exclude_platforms=()):
+        """Build matrix selection, overridden by any given platform patterns."""
+        if not include_platforms and not exclude_platforms:
+            include_platforms = self.include_platforms
+            exclude_platforms = self.exclude_platforms
+        return get_build_matrix_selector(
+            include_platforms,
+            exclude_platforms,
+            self.include_profiles,
+            self.exclude_profiles,
+            self.rules,
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_package_selector(include_packages, exclude_packages):
+    return PatternSelector(list(include_packages), list(exclude_packages))
+
+
+def get_package_selector(include_packages, exclude_packages):
+    """A shared ``PatternSelector`` per distinct list of package patterns."""
+    return _get_package_selector(
+        _freeze(item_to_list(include_packages)),
+        _freeze(item_to_list(exclude_packages)),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_selection_config(path):
+    with open(path) as f:
+        return SelectionConfig(yaml.load(f, Loader=YamlSafeLoader))
+
+
+def get_selection_config(path=None):
+    """The ``SelectionConfig`` of ``path``, parsed once per process.
+
+    Without a path the config selects everything.
+    """
+    if path is None:
+        return SelectionConfig()
+    return _get_selection_config(Path(path).resolve())